@@ -1,12 +1,66 @@
+import asyncio
+import inspect
 import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+
+PROFILES = {
+    'read_heavy': {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    },
+    'write_heavy': {
+        'busy_timeout': 10000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16384,
+        'mmap_size': 67108864,
+        'temp_store': 'MEMORY',
+    },
+    'bulk_load': {
+        'busy_timeout': 30000,
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -262144,
+        'mmap_size': 0,
+        'temp_store': 'MEMORY',
+    },
+}
+
+
+def apply_profile(connection, profile):
+    """Apply a named profile from PROFILES (or a dict of pragmas)"""
+    pragmas = PROFILES[profile] if isinstance(profile, str) else profile
+    for name, value in pragmas.items():
+        connection.execute(f"PRAGMA {name} = {value}")
+    return connection
+
+
+async def apply_profile_async(connection, profile):
+    """Apply a profile to an aiosqlite connection, see apply_profile"""
+    pragmas = PROFILES[profile] if isinstance(profile, str) else profile
+    for name, value in pragmas.items():
+        await connection.execute(f"PRAGMA {name} = {value}")
+    return connection
+
 
 class DatabaseConnection:
-    def __init__(self, db_name):
+    def __init__(self, db_name, profile=None):
         self.db_name = db_name
+        self.profile = profile
         self.connection = None
 
     def __enter__(self):
         self.connection = sqlite3.connect(self.db_name)
+        if self.profile is not None:
+            apply_profile(self.connection, self.profile)
         return self.connection
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -14,7 +68,369 @@ class DatabaseConnection:
             self.connection.close()
         if exc_type:
             print(f"An error occurred: {exc_val}")
-        return True  
+        return True
+
+
+class ConnectionPool:
+    """Bounded pool of reusable connections to one database
+
+    At most max_size connections exist at once; a caller that finds them
+    all checked out waits up to timeout seconds, then gets TimeoutError.
+    Returned connections are rolled back and reset before reuse, and a
+    connection left idle longer than idle_timeout seconds is closed.
+    """
+
+    def __init__(self, db_name, max_size=5, idle_timeout=60.0, timeout=5.0,
+                 profile=None):
+        self.db_name = db_name
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.profile = profile
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self.metrics = {'created': 0, 'reused': 0, 'expired': 0}
+
+    def _connect(self):
+        connection = sqlite3.connect(self.db_name, check_same_thread=False)
+        if self.profile is not None:
+            apply_profile(connection, self.profile)
+        with self._lock:
+            self.metrics['created'] += 1
+        return connection
+
+    def _expire_idle(self):
+        expired = []
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            while self._idle and self._idle[0][1] < cutoff:
+                expired.append(self._idle.popleft()[0])
+            self.metrics['expired'] += len(expired)
+        for connection in expired:
+            connection.close()
+
+    def acquire(self):
+        """Check out an idle connection, or open one if none is idle"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"no connection to {self.db_name} available "
+                               f"within {self.timeout}s")
+        try:
+            self._expire_idle()
+            with self._lock:
+                if self._idle:
+                    self.metrics['reused'] += 1
+                    return self._idle.pop()[0]
+            return self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection):
+        """Roll back and reset connection, then return it to the pool"""
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+            connection.row_factory = None
+            with self._lock:
+                self._idle.append((connection, time.monotonic()))
+        except sqlite3.Error:
+            connection.close()
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _ in idle:
+            connection.close()
+
+
+_pools = {}
+_pool_keys = {}
+_pools_lock = threading.Lock()
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((name, _freeze(v)) for name, v in value.items()))
+    return value
+
+
+def _pool_key(pool_class, db_name, options):
+    # Binding the signature is slow, so do it once per distinct call shape
+    raw = (pool_class, db_name, _freeze(options))
+    key = _pool_keys.get(raw)
+    if key is None:
+        bound = inspect.signature(pool_class).bind(db_name, **options)
+        bound.apply_defaults()
+        key = _pool_keys[raw] = _freeze(bound.arguments)
+    return key
+
+
+def get_pool(db_name, **options):
+    """Return the shared pool for db_name and options, creating it on first use
+
+    Pools are keyed by db_name together with their options (defaults filled
+    in), so a caller asking for another profile or size gets its own pool
+    instead of silently sharing one configured by the first caller.
+    """
+    key = _pool_key(ConnectionPool, db_name, options)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_name, **options)
+        return pool
+
+
+def close_pools():
+    """Close and forget every shared pool"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+class PooledDatabaseConnection(DatabaseConnection):
+    """DatabaseConnection that borrows from a pool instead of connecting
+
+    pool defaults to the shared pool for db_name, created with
+    pool_options (see ConnectionPool) on first use. Whatever the with block
+    leaves uncommitted is rolled back when the connection is returned.
+    """
+
+    def __init__(self, db_name, profile=None, pool=None, **pool_options):
+        super().__init__(db_name, profile)
+        self.pool = pool or get_pool(db_name, profile=profile, **pool_options)
+
+    def __enter__(self):
+        self.connection = self.pool.acquire()
+        return self.connection
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.connection:
+            self.pool.release(self.connection)
+            self.connection = None
+        if exc_type:
+            print(f"An error occurred: {exc_val}")
+        return True
+
+
+class AsyncConnectionPool:
+    """ConnectionPool counterpart holding aiosqlite connections
+
+    Each aiosqlite connection runs its queries on its own thread, so
+    reusing connections also reuses their threads: fanning out to any
+    number of coroutines starts at most max_size threads. Callers that
+    find every connection checked out queue in arrival order and a
+    returned connection is handed straight to the longest waiter, so a
+    newcomer can never overtake them. Use it from one event loop;
+    get_async_pool keeps a separate shared pool per loop.
+    """
+
+    def __init__(self, db_name, max_size=5, idle_timeout=60.0, timeout=5.0,
+                 profile=None):
+        self.db_name = db_name
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.profile = profile
+        self._idle = deque()
+        self._waiters = deque()
+        self._size = 0
+        self.metrics = {'created': 0, 'reused': 0, 'expired': 0, 'waits': 0,
+                        'timeouts': 0, 'peak_waiting': 0, 'total_wait': 0.0}
+
+    async def _connect(self):
+        import aiosqlite
+        connection = await aiosqlite.connect(self.db_name)
+        if self.profile is not None:
+            try:
+                await apply_profile_async(connection, self.profile)
+            except BaseException:
+                await connection.close()
+                raise
+        self.metrics['created'] += 1
+        return connection
+
+    async def _expire_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._idle and self._idle[0][1] < cutoff:
+            connection = self._idle.popleft()[0]
+            self._size -= 1
+            self.metrics['expired'] += 1
+            await connection.close()
+
+    def _has_waiters(self):
+        while self._waiters and self._waiters[0].done():
+            self._waiters.popleft()
+        return bool(self._waiters)
+
+    def _hand_off(self, connection):
+        # connection None passes on the right to open a new connection
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(connection)
+                return
+        if connection is None:
+            self._size -= 1
+        else:
+            self._idle.append((connection, time.monotonic()))
+
+    async def _wait_turn(self):
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.metrics['waits'] += 1
+        self.metrics['peak_waiting'] = max(self.metrics['peak_waiting'],
+                                           len(self._waiters))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait((waiter,), timeout=self.timeout)
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Cancelled just after being handed a connection: pass it on
+                self._hand_off(waiter.result())
+            waiter.cancel()
+            raise
+        finally:
+            self.metrics['total_wait'] += time.perf_counter() - start
+        if not waiter.done():
+            waiter.cancel()
+            self.metrics['timeouts'] += 1
+            raise TimeoutError(f"no connection to {self.db_name} available "
+                               f"within {self.timeout}s")
+        return waiter.result()
+
+    async def acquire(self):
+        """Check out an idle connection, or open one if none is idle"""
+        await self._expire_idle()
+        if self._has_waiters():
+            connection = await self._wait_turn()
+        elif self._idle:
+            connection = self._idle.pop()[0]
+        elif self._size < self.max_size:
+            self._size += 1
+            connection = None
+        else:
+            connection = await self._wait_turn()
+        if connection is not None:
+            self.metrics['reused'] += 1
+            return connection
+        try:
+            return await self._connect()
+        except BaseException:
+            self._hand_off(None)
+            raise
+
+    async def release(self, connection):
+        """Roll back and reset connection, then hand it to the next waiter"""
+        try:
+            if connection.in_transaction:
+                await connection.rollback()
+            connection.row_factory = None
+        except (sqlite3.Error, ValueError):
+            await connection.close()
+            connection = None
+        self._hand_off(connection)
+
+    @asynccontextmanager
+    async def connection(self):
+        """Async context manager yielding a pooled connection"""
+        connection = await self.acquire()
+        try:
+            yield connection
+        finally:
+            await self.release(connection)
+
+    def stats(self):
+        """Return pool size, queue depth and wait metrics"""
+        stats = dict(self.metrics, size=self._size, idle=len(self._idle),
+                     waiting=sum(not w.done() for w in self._waiters))
+        waits = stats['waits']
+        stats['avg_wait'] = stats['total_wait'] / waits if waits else 0.0
+        return stats
+
+    async def close(self):
+        """Close every idle connection"""
+        idle, self._idle = self._idle, deque()
+        self._size -= len(idle)
+        for connection, _ in idle:
+            await connection.close()
+
+
+_async_pools = weakref.WeakKeyDictionary()
+
+
+def get_async_pool(db_name, **options):
+    """Return the running loop's shared async pool for db_name and options
+
+    Pools are keyed by db_name and options as in get_pool. Close the pools
+    with close_async_pools() before the loop ends: each idle connection
+    keeps its worker thread, and the process, alive.
+    """
+    key = _pool_key(AsyncConnectionPool, db_name, options)
+    pools = _async_pools.setdefault(asyncio.get_running_loop(), {})
+    pool = pools.get(key)
+    if pool is None:
+        pool = pools[key] = AsyncConnectionPool(db_name, **options)
+    return pool
+
+
+async def close_async_pools():
+    """Close and forget the running loop's shared async pools"""
+    pools = _async_pools.pop(asyncio.get_running_loop(), {})
+    for pool in pools.values():
+        await pool.close()
+
+
+class AsyncDatabaseConnection:
+    """async with counterpart of DatabaseConnection, built on aiosqlite
+
+    With pooled=True the connection is borrowed from the loop's shared
+    AsyncConnectionPool for db_name (or from pool) and returned rolled
+    back on exit, as with PooledDatabaseConnection.
+    """
+
+    def __init__(self, db_name, profile=None, pooled=False, pool=None,
+                 **pool_options):
+        self.db_name = db_name
+        self.profile = profile
+        self.pooled = pooled or pool is not None
+        self.pool = pool
+        self.pool_options = pool_options
+        self.connection = None
+
+    async def __aenter__(self):
+        if self.pooled:
+            if self.pool is None:
+                self.pool = get_async_pool(self.db_name, profile=self.profile,
+                                           **self.pool_options)
+            self.connection = await self.pool.acquire()
+            return self.connection
+        import aiosqlite
+        self.connection = await aiosqlite.connect(self.db_name)
+        if self.profile is not None:
+            try:
+                await apply_profile_async(self.connection, self.profile)
+            except BaseException:
+                await self.connection.close()
+                self.connection = None
+                raise
+        return self.connection
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self.connection:
+            if self.pooled:
+                await self.pool.release(self.connection)
+            else:
+                await self.connection.close()
+            self.connection = None
+        if exc_type:
+            print(f"An error occurred: {exc_val}")
+        return True
+
 
 if __name__ == "__main__":
     with DatabaseConnection("users.db") as conn:
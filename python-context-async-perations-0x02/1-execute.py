@@ -1,23 +1,87 @@
 import sqlite3
+import time
+from itertools import islice
+
 
 class ExecuteQuery:
-    def __init__(self, db_name, query, params=None):
+    """Run query on entry and give the with block its rows
+
+    By default the block gets every row as a list. With stream=True it gets
+    a lazy iterator that fetches chunk_size rows at a time, so the first
+    row arrives before the rest are read and memory stays bounded by the
+    chunk; rows the block does not consume are never fetched.
+
+    With bulk=True params is an iterable of parameter tuples, run through
+    executemany chunk_size at a time in a single transaction that is rolled
+    back if any chunk fails. The block then gets a dict with the rows
+    affected, the chunks run, the seconds taken and rows_per_second.
+    """
+
+    def __init__(self, db_name, query, params=None, stream=False,
+                 chunk_size=500, bulk=False):
+        if stream and bulk:
+            raise ValueError("stream and bulk cannot be combined")
         self.db_name = db_name
         self.query = query
         self.params = params or []
+        self.stream = stream
+        self.bulk = bulk
+        self.chunk_size = chunk_size
         self.connection = None
         self.cursor = None
+        self.rows = None
 
     def __enter__(self):
         self.connection = sqlite3.connect(self.db_name)
         self.cursor = self.connection.cursor()
+        if self.bulk:
+            return self._execute_bulk()
         if self.params:
             self.cursor.execute(self.query, self.params)
         else:
             self.cursor.execute(self.query)
+        if self.stream:
+            self.rows = self._iter_rows()
+            return self.rows
         return self.cursor.fetchall()
 
+    def _execute_bulk(self):
+        params = iter(self.params)
+        affected = chunks = 0
+        start = time.perf_counter()
+        try:
+            while True:
+                chunk = list(islice(params, self.chunk_size))
+                if not chunk:
+                    break
+                self.cursor.executemany(self.query, chunk)
+                affected += self.cursor.rowcount
+                chunks += 1
+            self.connection.commit()
+        except BaseException:
+            self.connection.rollback()
+            self.cursor.close()
+            self.connection.close()
+            raise
+        seconds = time.perf_counter() - start
+        return {
+            'rows': affected,
+            'chunks': chunks,
+            'seconds': seconds,
+            'rows_per_second': affected / seconds if seconds else 0.0,
+        }
+
+    def _iter_rows(self):
+        while True:
+            rows = self.cursor.fetchmany(self.chunk_size)
+            if not rows:
+                return
+            yield from rows
+
     def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.rows is not None:
+            self.rows.close()
+            self.rows = None
         if self.cursor:
             self.cursor.close()
         if self.connection:
@@ -26,6 +90,92 @@ class ExecuteQuery:
             print(f"An error occurred: {exc_val}")
         return True
 
+
+class AsyncExecuteQuery:
+    """async with counterpart of ExecuteQuery, built on aiosqlite
+
+    Takes the same options. The block gets a list of rows, an async
+    iterator of rows with stream=True, or the bulk report with bulk=True.
+    """
+
+    def __init__(self, db_name, query, params=None, stream=False,
+                 chunk_size=500, bulk=False):
+        if stream and bulk:
+            raise ValueError("stream and bulk cannot be combined")
+        self.db_name = db_name
+        self.query = query
+        self.params = params or []
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.bulk = bulk
+        self.connection = None
+        self.cursor = None
+        self.rows = None
+
+    async def __aenter__(self):
+        import aiosqlite
+        self.connection = await aiosqlite.connect(self.db_name)
+        try:
+            if self.bulk:
+                return await self._execute_bulk()
+            self.cursor = await self.connection.execute(self.query,
+                                                        self.params)
+            if self.stream:
+                self.rows = self._iter_rows()
+                return self.rows
+            return await self.cursor.fetchall()
+        except BaseException:
+            # __aexit__ does not run, and the worker thread would outlive us
+            await self.connection.close()
+            self.connection = self.cursor = None
+            raise
+
+    async def _execute_bulk(self):
+        params = iter(self.params)
+        affected = chunks = 0
+        start = time.perf_counter()
+        try:
+            while True:
+                chunk = list(islice(params, self.chunk_size))
+                if not chunk:
+                    break
+                cursor = await self.connection.executemany(self.query, chunk)
+                affected += cursor.rowcount
+                await cursor.close()
+                chunks += 1
+            await self.connection.commit()
+        except BaseException:
+            await self.connection.rollback()
+            raise
+        seconds = time.perf_counter() - start
+        return {
+            'rows': affected,
+            'chunks': chunks,
+            'seconds': seconds,
+            'rows_per_second': affected / seconds if seconds else 0.0,
+        }
+
+    async def _iter_rows(self):
+        while True:
+            rows = await self.cursor.fetchmany(self.chunk_size)
+            if not rows:
+                return
+            for row in rows:
+                yield row
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self.rows is not None:
+            await self.rows.aclose()
+            self.rows = None
+        if self.cursor:
+            await self.cursor.close()
+        if self.connection:
+            await self.connection.close()
+        if exc_type:
+            print(f"An error occurred: {exc_val}")
+        return True
+
+
 if __name__ == "__main__":
     query = "SELECT * FROM users WHERE age > ?"
     params = (25,)
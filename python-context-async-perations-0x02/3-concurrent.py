@@ -1,23 +1,88 @@
 import asyncio
-import aiosqlite
 
-async def async_fetch_users():
-    async with aiosqlite.connect("users.db") as db:
-        async with db.execute("SELECT * FROM users") as cursor:
+_connection = __import__('0-databaseconnection')
+_executor = __import__('4-query_executor')
+
+DB_NAME = "users.db"
+POOL_SIZE = 4
+
+
+def get_pool():
+    """Return the shared connection pool for DB_NAME on the running loop"""
+    return _connection.get_async_pool(DB_NAME, max_size=POOL_SIZE)
+
+
+async def fetch_all(query, params=(), pool=None):
+    """Run query on a pooled connection and return every row"""
+    async with (pool or get_pool()).connection() as db:
+        async with db.execute(query, params) as cursor:
             return await cursor.fetchall()
 
+
+async def fetch_many(queries, pool=None):
+    """Run (query, params) pairs concurrently over one shared pool
+
+    However many queries there are, at most the pool's max_size
+    connections (and aiosqlite threads) are used; the rest wait their
+    turn in order.
+    """
+    pool = pool or get_pool()
+    return await asyncio.gather(*(fetch_all(query, params, pool)
+                                  for query, params in queries))
+
+
+async def stream_batches(query, params=(), chunk_size=500, pool=None):
+    """Yield the rows of query in lists of up to chunk_size rows
+
+    Rows are fetched a chunk at a time with fetchmany, so the table is
+    never held in memory at once. The pooled connection is held until the
+    generator is exhausted or closed, so wrap it in contextlib.aclosing()
+    when the consumer may stop early.
+    """
+    async with (pool or get_pool()).connection() as db:
+        async with db.execute(query, params) as cursor:
+            while True:
+                rows = await cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+
+
+async def stream_rows(query, params=(), chunk_size=500, pool=None):
+    """Yield the rows of query one at a time, see stream_batches"""
+    batches = stream_batches(query, params, chunk_size, pool)
+    try:
+        async for rows in batches:
+            for row in rows:
+                yield row
+    finally:
+        await batches.aclose()
+
+
+async def async_fetch_users():
+    return await fetch_all("SELECT * FROM users")
+
+
 async def async_fetch_older_users():
-    async with aiosqlite.connect("users.db") as db:
-        async with db.execute("SELECT * FROM users WHERE age > 40") as cursor:
-            return await cursor.fetchall()
+    return await fetch_all("SELECT * FROM users WHERE age > 40")
+
 
 async def fetch_concurrently():
-    all_users, older_users = await asyncio.gather(
-        async_fetch_users(),
-        async_fetch_older_users()
-    )
-    print("All users:", all_users)
-    print("Users older than 40:", older_users)
+    executor = _executor.QueryExecutor(DB_NAME, concurrency=POOL_SIZE,
+                                       pool=get_pool())
+    all_users, older_users = await executor.run([
+        "SELECT * FROM users",
+        "SELECT * FROM users WHERE age > 40",
+    ])
+    print("All users:", all_users.rows)
+    print("Users older than 40:", older_users.rows)
+
+
+async def main():
+    try:
+        await fetch_concurrently()
+    finally:
+        await _connection.close_async_pools()
 
 if __name__ == "__main__":
-    asyncio.run(fetch_concurrently())
+    asyncio.run(main())
@@ -0,0 +1,233 @@
+import re
+import time
+import asyncio
+import operator
+from collections import namedtuple
+from collections.abc import Mapping
+
+_connection = __import__('0-databaseconnection')
+
+QueryResult = namedtuple('QueryResult',
+                         'query params rows latency source')
+
+_SELECT_ALL = re.compile(
+    r"^\s*SELECT\s+\*\s+FROM\s+(\w+)(?:\s+WHERE\s+(.+?))?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL)
+_TERM = re.compile(
+    r"^\s*(\w+)\s*(=|==|!=|<>|<=|>=|<|>)\s*(\?|-?\d+(?:\.\d+)?|'[^']*')\s*$")
+_END = object()
+_AND = re.compile(r"\s+AND\s+", re.IGNORECASE)
+_COLLATE = re.compile(r"\bCOLLATE\b", re.IGNORECASE)
+_OPERATORS = {
+    '=': operator.eq, '==': operator.eq, '!=': operator.ne, '<>': operator.ne,
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+}
+
+
+class _Unsupported(Exception):
+    """The predicate cannot be evaluated in Python exactly as SQLite would"""
+
+
+def _literal(token, params):
+    if token == '?':
+        return next(params)
+    if token.startswith("'"):
+        return token[1:-1]
+    return float(token) if '.' in token else int(token)
+
+
+def _comparable(a, b):
+    numbers = (int, float)
+    if isinstance(a, bool) or isinstance(b, bool):
+        return False
+    return (isinstance(a, numbers) and isinstance(b, numbers)) or (
+        isinstance(a, str) and isinstance(b, str))
+
+
+def parse_scan(query, params=()):
+    """Parse "SELECT * FROM table [WHERE ...]" into (table, terms)
+
+    terms is a list of (column, op, value). Only conjunctions of simple
+    comparisons against literals or ? parameters are recognised; anything
+    else (OR, functions, ORDER BY, LIMIT, joins, named parameters) returns
+    None so the query always runs on its own.
+    """
+    match = _SELECT_ALL.match(query)
+    if match is None or isinstance(params, Mapping):
+        return None
+    table, where = match.groups()
+    if where is None:
+        return (table, []) if not params else None
+    values = iter(params)
+    terms = []
+    for term in _AND.split(where):
+        term_match = _TERM.match(term)
+        if term_match is None:
+            return None
+        column, op, token = term_match.groups()
+        try:
+            terms.append((column, _OPERATORS[op], _literal(token, values)))
+        except StopIteration:
+            return None
+    if next(values, _END) is not _END:
+        return None
+    return table, terms
+
+
+def _freeze(params):
+    # frozenset never equals a tuple, so named and positional params differ
+    if isinstance(params, Mapping):
+        return frozenset(params.items())
+    return params
+
+
+def filter_rows(rows, columns, terms):
+    """Return the rows of a full scan matching terms, as SQLite would
+
+    Raises _Unsupported when a comparison would mix types, where SQLite's
+    affinity rules and Python's comparisons disagree. NULL never matches.
+    """
+    index = {name: i for i, name in enumerate(columns)}
+    try:
+        checks = [(index[column], op, value) for column, op, value in terms]
+    except KeyError:
+        raise _Unsupported("unknown column") from None
+    matched = []
+    for row in rows:
+        for i, op, value in checks:
+            cell = row[i]
+            if cell is None:
+                break
+            if not _comparable(cell, value):
+                raise _Unsupported(f"cannot compare {cell!r} and {value!r}")
+            if not op(cell, value):
+                break
+        else:
+            matched.append(row)
+    return matched
+
+
+class QueryExecutor:
+    """Runs a batch of read queries concurrently with shared scans
+
+    At most concurrency queries run at once, on connections from pool (the
+    loop's shared pool for db_name by default). Identical queries run once.
+    When the batch also contains the full scan "SELECT * FROM t", simple
+    filters of it ("SELECT * FROM t WHERE age > ?") are answered by
+    filtering that scan's rows instead of scanning again; their rows keep
+    the scan's order. Tables declaring a COLLATE clause are never filtered
+    in Python, as its comparisons only match SQLite's BINARY collation.
+    Each QueryResult reports its latency from the start of the batch and
+    its source: 'executed', 'duplicate' or 'shared'.
+    """
+
+    def __init__(self, db_name="users.db", concurrency=4, pool=None,
+                 share_scans=True):
+        self.db_name = db_name
+        self.concurrency = concurrency
+        self.pool = pool
+        self.share_scans = share_scans
+
+    async def _execute(self, pool, slots, query, params, start):
+        async with slots:
+            async with pool.connection() as db:
+                async with db.execute(query, params) as cursor:
+                    rows = await cursor.fetchall()
+                    columns = [d[0] for d in cursor.description or ()]
+        return rows, columns, time.perf_counter() - start
+
+    def _plan(self, keys, params):
+        scans = {}
+        for key in keys:
+            parsed = (parse_scan(key[0], params[key]) if self.share_scans
+                      else None)
+            if parsed is not None and not parsed[1]:
+                scans.setdefault(parsed[0], key)
+        derived = {}
+        for key in keys:
+            parsed = parse_scan(key[0], params[key]) if scans else None
+            if parsed is not None and parsed[1] and parsed[0] in scans:
+                derived[key] = (scans[parsed[0]], parsed[1], parsed[0])
+        return derived
+
+    async def _binary_tables(self, pool, tables):
+        # filter_rows compares like the default BINARY collation; a table
+        # declaring any other collation (or a view) is left to SQLite
+        binary = set()
+        async with pool.connection() as db:
+            for table in tables:
+                async with db.execute(
+                        "SELECT sql FROM sqlite_master "
+                        "WHERE type = 'table' AND name = ?",
+                        (table,)) as cursor:
+                    row = await cursor.fetchone()
+                if row is not None and not _COLLATE.search(row[0] or ''):
+                    binary.add(table)
+        return binary
+
+    async def run(self, queries, timeout=None):
+        """Run queries and return a QueryResult for each, in order
+
+        Each query is a SQL string or a (query, params) pair, params being
+        a sequence or a mapping of named parameters. With timeout, every
+        query still running after timeout seconds is cancelled and
+        asyncio.TimeoutError is raised; cancelling the caller cancels them
+        too.
+        """
+        start = time.perf_counter()
+        pool = self.pool or _connection.get_async_pool(
+            self.db_name, max_size=self.concurrency)
+        slots = asyncio.Semaphore(self.concurrency)
+        items = [(item, ()) if isinstance(item, str) else
+                 (item[0], dict(item[1]) if isinstance(item[1], Mapping)
+                  else tuple(item[1])) for item in queries]
+        keys = [(query, _freeze(params)) for query, params in items]
+        params = {key: item[1] for key, item in zip(keys, items)}
+        unique = list(dict.fromkeys(keys))
+        derived = self._plan(unique, params)
+        if derived:
+            binary = await self._binary_tables(
+                pool, {table for _, _, table in derived.values()})
+            derived = {key: plan for key, plan in derived.items()
+                       if plan[2] in binary}
+        tasks = {}
+        for key in unique:
+            if key not in derived:
+                tasks[key] = asyncio.ensure_future(self._execute(
+                    pool, slots, key[0], params[key], start))
+        try:
+            done = dict(zip(tasks, await asyncio.wait_for(
+                asyncio.gather(*tasks.values()), timeout)))
+            outputs = {key: (rows, latency, 'executed')
+                       for key, (rows, _, latency) in done.items()}
+            fallback = {}
+            for key, (base, terms, _) in derived.items():
+                rows, columns, _ = done[base]
+                try:
+                    matched = filter_rows(rows, columns, terms)
+                except _Unsupported:
+                    fallback[key] = asyncio.ensure_future(
+                        self._execute(pool, slots, key[0], params[key], start))
+                    continue
+                outputs[key] = (matched, time.perf_counter() - start, 'shared')
+            if fallback:
+                tasks.update(fallback)
+                if timeout is not None:
+                    timeout -= time.perf_counter() - start
+                results = await asyncio.wait_for(
+                    asyncio.gather(*fallback.values()), timeout)
+                for key, (rows, _, latency) in zip(fallback, results):
+                    outputs[key] = (rows, latency, 'executed')
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        seen = set()
+        results = []
+        for key in keys:
+            rows, latency, source = outputs[key]
+            if key in seen:
+                source = 'duplicate'
+            seen.add(key)
+            results.append(QueryResult(key[0], params[key], rows, latency,
+                                       source))
+        return results
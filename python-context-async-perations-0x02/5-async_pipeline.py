@@ -0,0 +1,135 @@
+import asyncio
+import inspect
+
+_concurrent = __import__('3-concurrent')
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+async def _call(func, item):
+    result = func(item)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+class Pipeline:
+    """Async pipeline of filter, map and batch stages over an async iterable
+
+    Each stage runs in its own task and hands items to the next through a
+    queue holding at most buffer items. When the consumer falls behind the
+    queues fill and every stage, down to the source, waits for room, so a
+    row streamed from the database is only fetched once there is space for
+    it. Stage functions may be plain functions or coroutines. An exception
+    in the source or a stage is raised to the consumer, and leaving the
+    async for early cancels the stages and closes the source.
+
+        async for batch in (Pipeline(stream_rows("SELECT * FROM users"))
+                            .filter(lambda row: row[2] > 40)
+                            .map(enrich).batch(100)):
+            ...
+    """
+
+    def __init__(self, source, buffer=64):
+        self.source = source
+        self.buffer = buffer
+        self.stages = []
+
+    def filter(self, predicate):
+        """Keep only the items for which predicate is true"""
+        self.stages.append(('filter', predicate))
+        return self
+
+    def map(self, func):
+        """Replace each item with func(item)"""
+        self.stages.append(('map', func))
+        return self
+
+    def batch(self, size):
+        """Group items into lists of size, the last one possibly shorter"""
+        if size < 1:
+            raise ValueError("batch size must be at least 1")
+        self.stages.append(('batch', size))
+        return self
+
+    async def _feed(self, out):
+        try:
+            async for item in self.source:
+                await out.put(item)
+        except Exception as e:
+            await out.put(_Failure(e))
+            return
+        finally:
+            if hasattr(self.source, 'aclose'):
+                await self.source.aclose()
+        await out.put(_DONE)
+
+    async def _run_stage(self, kind, arg, inbox, out):
+        pending = []
+        while True:
+            item = await inbox.get()
+            if item is _DONE or isinstance(item, _Failure):
+                if pending and item is _DONE:
+                    await out.put(pending)
+                await out.put(item)
+                return
+            try:
+                if kind == 'filter':
+                    if await _call(arg, item):
+                        await out.put(item)
+                elif kind == 'map':
+                    await out.put(await _call(arg, item))
+                else:
+                    pending.append(item)
+                    if len(pending) >= arg:
+                        await out.put(pending)
+                        pending = []
+            except Exception as e:
+                await out.put(_Failure(e))
+                return
+
+    async def __aiter__(self):
+        queues = [asyncio.Queue(self.buffer)
+                  for _ in range(len(self.stages) + 1)]
+        tasks = [asyncio.ensure_future(self._feed(queues[0]))]
+        for (kind, arg), inbox, out in zip(self.stages, queues, queues[1:]):
+            tasks.append(asyncio.ensure_future(
+                self._run_stage(kind, arg, inbox, out)))
+        try:
+            while True:
+                item = await queues[-1].get()
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def count_older_users(age=40):
+    older = 0
+    pipeline = (Pipeline(_concurrent.stream_rows("SELECT * FROM users",
+                                                 chunk_size=100))
+                .filter(lambda row: row[2] > age)
+                .batch(2))
+    async for batch in pipeline:
+        older += len(batch)
+    return older
+
+
+async def main():
+    try:
+        print("Users older than 40:", await count_older_users())
+    finally:
+        await _concurrent._connection.close_async_pools()
+
+if __name__ == "__main__":
+    asyncio.run(main())
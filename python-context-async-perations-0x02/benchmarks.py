@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the python-context-async-perations-0x02 context managers
+
+Run from this directory: python3 benchmarks.py
+"""
+import os
+import sqlite3
+import tempfile
+import time
+
+connection_module = __import__('0-databaseconnection')
+execute_module = __import__('1-execute')
+
+
+def make_users_db(rows=1000):
+    """Create a temporary users database and return its path"""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    conn = sqlite3.connect(path)
+    conn.execute("""
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        age INTEGER NOT NULL
+    )
+    """)
+    conn.executemany("INSERT INTO users (name, age) VALUES (?, ?)",
+                     ((f"user{i}", 18 + i % 60) for i in range(rows)))
+    conn.commit()
+    conn.close()
+    return path
+
+
+def calls_per_second(func, duration=1.0, *args, **kwargs):
+    """Call func repeatedly for duration seconds and return the call rate"""
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + duration
+    while time.perf_counter() < deadline:
+        func(*args, **kwargs)
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+
+def bench_pooled_connection(path, duration=1.0):
+    """Compare connect-per-block against the pooled context manager"""
+    def short_query(manager):
+        with manager(path) as conn:
+            conn.execute("SELECT * FROM users WHERE id = ?", (1,)).fetchone()
+
+    results = {
+        'connect per block': calls_per_second(
+            short_query, duration, connection_module.DatabaseConnection),
+        'pooled': calls_per_second(
+            short_query, duration, connection_module.PooledDatabaseConnection),
+    }
+    connection_module.close_pools()
+    return results
+
+
+def bench_streaming(size=200000):
+    """Time to first row and total time, fetchall vs streaming
+
+    Returns {mode: (first_row_seconds, total_seconds)}.
+    """
+    path = make_users_db(size)
+    results = {}
+    try:
+        for name, stream in (('fetchall', False), ('stream', True)):
+            start = time.perf_counter()
+            with execute_module.ExecuteQuery(path, "SELECT * FROM users",
+                                             stream=stream) as rows:
+                first_row = None
+                for _ in rows:
+                    if first_row is None:
+                        first_row = time.perf_counter() - start
+            results[name] = (first_row, time.perf_counter() - start)
+    finally:
+        os.remove(path)
+    return results
+
+
+def bench_bulk_insert(rows=2000):
+    """Rows inserted per second, a connection and commit per row vs bulk"""
+    query = "INSERT INTO users (name, age) VALUES (?, ?)"
+    params = [(f"bulk{i}", 18 + i % 60) for i in range(rows)]
+    results = {}
+    for name in ('commit per row', 'bulk'):
+        path = make_users_db(0)
+        try:
+            start = time.perf_counter()
+            if name == 'bulk':
+                with execute_module.ExecuteQuery(path, query, params,
+                                                 bulk=True):
+                    pass
+            else:
+                for row in params:
+                    with connection_module.DatabaseConnection(path) as conn:
+                        conn.execute(query, row)
+                        conn.commit()
+            results[name] = rows / (time.perf_counter() - start)
+        finally:
+            os.remove(path)
+    return results
+
+
+def report(title, results, unit='calls/s'):
+    """Print benchmark results relative to the first entry"""
+    print(title)
+    baseline = next(iter(results.values()))
+    for name, rate in results.items():
+        print(f"  {name:<20} {rate:>12,.0f} {unit}  x{rate / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    db_path = make_users_db()
+    try:
+        report("DatabaseConnection: short queries", bench_pooled_connection(db_path))
+    finally:
+        os.remove(db_path)
+
+    report("ExecuteQuery: inserting 2,000 rows", bench_bulk_insert(),
+           unit='rows/s')
+    print("ExecuteQuery: SELECT * over 200,000 rows")
+    for name, (first_row, total) in bench_streaming().items():
+        print(f"  {name:<20} first row {first_row * 1000:>8.2f} ms"
+              f"  total {total * 1000:>8.1f} ms")
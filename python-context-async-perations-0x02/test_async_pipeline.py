@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Test async streaming generators and the async_pipeline module
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+
+connection_module = __import__('0-databaseconnection')
+concurrent_module = __import__('3-concurrent')
+pipeline_module = __import__('5-async_pipeline')
+
+
+async def numbers(count, produced=None, closed=None):
+    """
+    Yield 0..count-1, recording what was produced and whether it was closed
+    """
+    try:
+        for i in range(count):
+            if produced is not None:
+                produced.append(i)
+            yield i
+            await asyncio.sleep(0)
+    finally:
+        if closed is not None:
+            closed.append(True)
+
+
+class TestStreamRows(unittest.TestCase):
+    """
+    Test stream_rows and stream_batches over a pooled connection
+    """
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, age INTEGER)")
+        conn.executemany("INSERT INTO users (age) VALUES (?)",
+                         [(20 + i,) for i in range(25)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        os.remove(self.db_path)
+
+    def test_batches_and_rows(self):
+        """
+        Test rows arrive in chunk_size batches and individually
+        """
+        async def main():
+            pool = connection_module.AsyncConnectionPool(self.db_path)
+            try:
+                sizes = [len(rows) async for rows in
+                         concurrent_module.stream_batches(
+                             "SELECT * FROM users", chunk_size=10, pool=pool)]
+                ids = [row[0] async for row in concurrent_module.stream_rows(
+                    "SELECT * FROM users WHERE age > ?", (40,), pool=pool)]
+                return sizes, ids
+            finally:
+                await pool.close()
+
+        sizes, ids = asyncio.run(main())
+        self.assertEqual(sizes, [10, 10, 5])
+        self.assertEqual(ids, [22, 23, 24, 25])
+
+    def test_close_returns_connection(self):
+        """
+        Test closing a stream early hands its connection back to the pool
+        """
+        async def main():
+            pool = connection_module.AsyncConnectionPool(self.db_path)
+            try:
+                rows = concurrent_module.stream_rows(
+                    "SELECT * FROM users", chunk_size=5, pool=pool)
+                await rows.__anext__()
+                await rows.aclose()
+                return pool.stats()['idle']
+            finally:
+                await pool.close()
+
+        self.assertEqual(asyncio.run(main()), 1)
+
+
+class TestPipeline(unittest.TestCase):
+    """
+    Test filter, map and batch stages with backpressure
+    """
+
+    def collect(self, pipeline):
+        """
+        Return every item the pipeline yields
+        """
+        async def main():
+            return [item async for item in pipeline]
+        return asyncio.run(main())
+
+    def test_stages(self):
+        """
+        Test stages apply in order, with sync and async functions
+        """
+        async def square(n):
+            return n * n
+
+        pipeline = (pipeline_module.Pipeline(numbers(10))
+                    .filter(lambda n: n % 2)
+                    .map(square)
+                    .batch(2))
+        self.assertEqual(self.collect(pipeline), [[1, 9], [25, 49], [81]])
+
+    def test_backpressure(self):
+        """
+        Test a slow consumer keeps the source from running far ahead
+        """
+        produced = []
+
+        async def main():
+            pipeline = pipeline_module.Pipeline(
+                numbers(1000, produced), buffer=2).map(lambda n: n)
+            ahead = 0
+            async for item in pipeline:
+                await asyncio.sleep(0.001)
+                ahead = max(ahead, len(produced) - item)
+                if item == 50:
+                    break
+            return ahead
+
+        self.assertLessEqual(asyncio.run(main()), 8)
+
+    def test_error_propagates(self):
+        """
+        Test an exception in a stage is raised to the consumer
+        """
+        pipeline = pipeline_module.Pipeline(numbers(5)).map(
+            lambda n: 1 / (n - 3))
+        with self.assertRaises(ZeroDivisionError):
+            self.collect(pipeline)
+
+    def test_early_exit_closes_source(self):
+        """
+        Test closing the pipeline cancels the stages and closes the source
+        """
+        closed = []
+
+        async def main():
+            items = pipeline_module.Pipeline(
+                numbers(1000, closed=closed)).batch(3).__aiter__()
+            first = await items.__anext__()
+            await items.aclose()
+            return first
+
+        self.assertEqual(asyncio.run(main()), [0, 1, 2])
+        self.assertEqual(closed, [True])
+
+    def test_invalid_batch_size(self):
+        """
+        Test a batch size below one is rejected
+        """
+        with self.assertRaises(ValueError):
+            pipeline_module.Pipeline(numbers(1)).batch(0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test concurrent module and the shared async connection pool
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+connection_module = __import__('0-databaseconnection')
+concurrent_module = __import__('3-concurrent')
+
+
+def worker_threads():
+    """
+    Return the number of live aiosqlite worker threads
+    """
+    return sum('_connection_worker_thread' in t.name
+               for t in threading.enumerate())
+
+
+class TestAsyncPool(unittest.TestCase):
+    """
+    Test bounded, fair connection sharing for concurrent queries
+    """
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                     "name TEXT, age INTEGER)")
+        conn.executemany("INSERT INTO users (name, age) VALUES (?, ?)",
+                         [("Alice", 30), ("Bob", 45), ("Diana", 50)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        os.remove(self.db_path)
+
+    def test_fan_out_reuses_threads(self):
+        """
+        Test many concurrent queries share max_size connections
+        """
+        async def main():
+            pool = connection_module.AsyncConnectionPool(self.db_path,
+                                                         max_size=3)
+            before = worker_threads()
+            try:
+                results = await concurrent_module.fetch_many(
+                    [("SELECT name FROM users WHERE age > ?", (age,))
+                     for age in range(100)], pool=pool)
+                return results, worker_threads() - before, pool.stats()
+            finally:
+                await pool.close()
+
+        results, threads, stats = asyncio.run(main())
+        self.assertEqual(results[40], [("Bob",), ("Diana",)])
+        self.assertLessEqual(threads, 3)
+        self.assertEqual(stats['created'], 3)
+        self.assertEqual(stats['reused'], 97)
+
+    def test_fair_order(self):
+        """
+        Test connections go to waiters in arrival order, ahead of newcomers
+        """
+        async def main():
+            pool = connection_module.AsyncConnectionPool(self.db_path,
+                                                         max_size=1)
+            order = []
+
+            async def use(name):
+                async with pool.connection():
+                    order.append(name)
+                    await asyncio.sleep(0)
+
+            conn = await pool.acquire()
+            first = asyncio.ensure_future(use('first'))
+            second = asyncio.ensure_future(use('second'))
+            await asyncio.sleep(0)
+            await pool.release(conn)
+            newcomer = asyncio.ensure_future(use('newcomer'))
+            await asyncio.gather(first, second, newcomer)
+            stats = pool.stats()
+            await pool.close()
+            return order, stats
+
+        order, stats = asyncio.run(main())
+        self.assertEqual(order, ['first', 'second', 'newcomer'])
+        self.assertEqual(stats['peak_waiting'], 2)
+        self.assertEqual((stats['size'], stats['idle']), (1, 1))
+
+    def test_wait_timeout(self):
+        """
+        Test a waiter gives up after timeout and the pool stays usable
+        """
+        async def main():
+            pool = connection_module.AsyncConnectionPool(
+                self.db_path, max_size=1, timeout=0.02)
+            conn = await pool.acquire()
+            with self.assertRaises(TimeoutError):
+                await pool.acquire()
+            await pool.release(conn)
+            self.assertIs(await pool.acquire(), conn)
+            await pool.release(conn)
+            stats = pool.stats()
+            await pool.close()
+            return stats
+
+        self.assertEqual(asyncio.run(main())['timeouts'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Test databaseconnection module
+"""
+import asyncio
+import inspect
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+connection_module = __import__('0-databaseconnection')
+
+
+class TestPooledDatabaseConnection(unittest.TestCase):
+    """
+    Test ConnectionPool and PooledDatabaseConnection
+    """
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("INSERT INTO users (name) VALUES ('Alice')")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        connection_module.close_pools()
+        os.remove(self.db_path)
+
+    def test_connection_reused(self):
+        """
+        Test consecutive with blocks share one pooled connection
+        """
+        seen = []
+        for _ in range(2):
+            with connection_module.PooledDatabaseConnection(self.db_path) as conn:
+                seen.append(conn)
+                self.assertEqual(
+                    conn.execute("SELECT name FROM users").fetchone(),
+                    ("Alice",))
+        self.assertIs(seen[0], seen[1])
+        pool = connection_module.get_pool(self.db_path)
+        self.assertEqual(pool.metrics['created'], 1)
+        self.assertEqual(pool.metrics['reused'], 1)
+
+    def test_rollback_on_return(self):
+        """
+        Test uncommitted changes are rolled back when the block exits
+        """
+        with connection_module.PooledDatabaseConnection(self.db_path) as conn:
+            conn.execute("INSERT INTO users (name) VALUES ('Bob')")
+            conn.row_factory = sqlite3.Row
+        with connection_module.PooledDatabaseConnection(self.db_path) as conn:
+            self.assertIsNone(conn.row_factory)
+            self.assertEqual(
+                conn.execute("SELECT COUNT(*) FROM users").fetchone(), (1,))
+
+    def test_max_size(self):
+        """
+        Test a caller waits for a free connection, then times out
+        """
+        pool = connection_module.ConnectionPool(self.db_path, max_size=1,
+                                                timeout=0.05)
+        conn = pool.acquire()
+        with self.assertRaises(TimeoutError):
+            pool.acquire()
+        threading.Timer(0.01, pool.release, (conn,)).start()
+        self.assertIs(pool.acquire(), conn)
+        pool.close()
+
+    def test_idle_timeout(self):
+        """
+        Test a connection idle past idle_timeout is replaced
+        """
+        pool = connection_module.ConnectionPool(self.db_path, idle_timeout=0.01)
+        first = pool.acquire()
+        pool.release(first)
+        time.sleep(0.02)
+        second = pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertEqual(pool.metrics['expired'], 1)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            first.execute("SELECT 1")
+        pool.release(second)
+        pool.close()
+
+    def test_pools_keyed_by_options(self):
+        """
+        Test get_pool shares a pool only between identical options
+        """
+        default = connection_module.get_pool(self.db_path)
+        self.assertIs(connection_module.get_pool(self.db_path, max_size=5),
+                      default)
+        small = connection_module.get_pool(self.db_path, max_size=1)
+        tuned = connection_module.get_pool(self.db_path, profile='read_heavy')
+        self.assertIsNot(small, default)
+        self.assertIsNot(tuned, default)
+        self.assertEqual(small.max_size, 1)
+        with connection_module.PooledDatabaseConnection(
+                self.db_path, profile='read_heavy') as conn:
+            self.assertEqual(
+                conn.execute("PRAGMA journal_mode").fetchone(), ('wal',))
+        self.assertEqual(tuned.metrics['created'], 1)
+        connection_module.close_pools()
+        self.assertIsNot(connection_module.get_pool(self.db_path), default)
+
+    def test_pool_lookup_binds_once(self):
+        """
+        Test repeated pooled blocks do not re-inspect the pool options
+        """
+        with mock.patch.object(inspect, 'signature',
+                               wraps=inspect.signature) as signature:
+            for _ in range(3):
+                with connection_module.PooledDatabaseConnection(
+                        self.db_path, profile='read_heavy'):
+                    pass
+        self.assertEqual(signature.call_count, 1)
+
+
+class TestAsyncDatabaseConnection(unittest.TestCase):
+    """
+    Test AsyncDatabaseConnection with and without a pool
+    """
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("INSERT INTO users (name) VALUES ('Alice')")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        os.remove(self.db_path)
+
+    def test_unpooled(self):
+        """
+        Test a fresh aiosqlite connection is opened and closed
+        """
+        async def main():
+            manager = connection_module.AsyncDatabaseConnection(self.db_path)
+            async with manager as conn:
+                async with conn.execute("SELECT name FROM users") as cursor:
+                    row = await cursor.fetchone()
+            return row, manager.connection
+
+        row, connection = asyncio.run(main())
+        self.assertEqual(row, ("Alice",))
+        self.assertIsNone(connection)
+
+    def test_pooled_rollback_and_reuse(self):
+        """
+        Test pooled blocks reuse one connection and roll back on exit
+        """
+        async def main():
+            seen = []
+            for name in ("Bob", "Carol"):
+                async with connection_module.AsyncDatabaseConnection(
+                        self.db_path, pooled=True) as conn:
+                    seen.append(conn)
+                    await conn.execute("INSERT INTO users (name) VALUES (?)",
+                                       (name,))
+            async with connection_module.AsyncDatabaseConnection(
+                    self.db_path, pooled=True) as conn:
+                async with conn.execute("SELECT COUNT(*) FROM users") as cursor:
+                    count = await cursor.fetchone()
+            pool = connection_module.get_async_pool(self.db_path)
+            created = pool.metrics['created']
+            await connection_module.close_async_pools()
+            return seen, count, created
+
+        seen, count, created = asyncio.run(main())
+        self.assertIs(seen[0], seen[1])
+        self.assertEqual(count, (1,))
+        self.assertEqual(created, 1)
+
+    def test_async_pools_keyed_by_options(self):
+        """
+        Test get_async_pool shares a pool only between identical options
+        """
+        async def main():
+            small = connection_module.get_async_pool(self.db_path,
+                                                     max_size=1)
+            tuned = connection_module.get_async_pool(
+                self.db_path, max_size=10, profile='read_heavy')
+            default = connection_module.get_async_pool(self.db_path)
+            async with connection_module.AsyncDatabaseConnection(
+                    self.db_path, profile='read_heavy', pooled=True,
+                    max_size=10) as conn:
+                async with conn.execute("PRAGMA journal_mode") as cursor:
+                    mode = await cursor.fetchone()
+            same = (connection_module.get_async_pool(self.db_path,
+                                                     profile=None) is default)
+            await connection_module.close_async_pools()
+            return small, tuned, default, mode, same
+
+        small, tuned, default, mode, same = asyncio.run(main())
+        self.assertEqual((small.max_size, small.profile), (1, None))
+        self.assertEqual((tuned.max_size, tuned.profile), (10, 'read_heavy'))
+        self.assertIsNot(default, small)
+        self.assertTrue(same)
+        self.assertEqual(mode, ('wal',))
+        self.assertEqual(tuned.metrics['created'], 1)
+
+    def test_profile_failure_closes_connection(self):
+        """
+        Test a failing profile leaves no aiosqlite worker thread behind
+        """
+        manager = connection_module.AsyncDatabaseConnection(
+            self.db_path, profile={'no_such_pragma': 'x) ('})
+
+        async def main():
+            with self.assertRaises(sqlite3.OperationalError):
+                await manager.__aenter__()
+
+        before = set(threading.enumerate())
+        asyncio.run(main())
+        for thread in set(threading.enumerate()) - before:
+            thread.join(1)
+            self.assertFalse(thread.is_alive())
+        self.assertIsNone(manager.connection)
+
+    def test_pool_timeout(self):
+        """
+        Test acquire raises TimeoutError when every connection is out
+        """
+        async def main():
+            pool = connection_module.AsyncConnectionPool(
+                self.db_path, max_size=1, timeout=0.05)
+            conn = await pool.acquire()
+            try:
+                with self.assertRaises(TimeoutError):
+                    await pool.acquire()
+            finally:
+                await pool.release(conn)
+                await pool.close()
+
+        asyncio.run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test execute module
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+execute_module = __import__('1-execute')
+
+
+class TestExecuteQuery(unittest.TestCase):
+    """
+    Test ExecuteQuery in list and streaming modes
+    """
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                     "name TEXT, age INTEGER)")
+        conn.executemany("INSERT INTO users (name, age) VALUES (?, ?)",
+                         [(f"user{i}", 20 + i) for i in range(10)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        os.remove(self.db_path)
+
+    def test_fetchall_default(self):
+        """
+        Test the default mode still returns a list of every row
+        """
+        with execute_module.ExecuteQuery(
+                self.db_path, "SELECT age FROM users WHERE age > ?",
+                (25,)) as results:
+            self.assertEqual(results, [(age,) for age in range(26, 30)])
+
+    def test_stream_yields_every_row(self):
+        """
+        Test streaming yields all rows across chunks
+        """
+        with execute_module.ExecuteQuery(self.db_path, "SELECT id FROM users",
+                                         stream=True, chunk_size=3) as rows:
+            self.assertNotIsInstance(rows, list)
+            self.assertEqual([row[0] for row in rows], list(range(1, 11)))
+
+    def test_stream_fetches_lazily(self):
+        """
+        Test only the chunks consumed are fetched
+        """
+        query = execute_module.ExecuteQuery(self.db_path, "SELECT id FROM users",
+                                            stream=True, chunk_size=2)
+        with query as rows:
+            self.assertEqual(next(rows), (1,))
+            self.assertEqual(query.cursor.fetchone(), (3,))
+
+    def test_stream_closed_on_early_exit(self):
+        """
+        Test leaving the block early closes the cursor and the iterator
+        """
+        query = execute_module.ExecuteQuery(self.db_path, "SELECT id FROM users",
+                                            stream=True, chunk_size=2)
+        with query as rows:
+            for row in rows:
+                break
+        self.assertEqual(list(rows), [])
+        with self.assertRaises(sqlite3.ProgrammingError):
+            query.cursor.fetchone()
+
+    def test_bulk_insert(self):
+        """
+        Test bulk mode inserts every row in chunks and reports the rate
+        """
+        rows = ((f"bulk{i}", i) for i in range(25))
+        with execute_module.ExecuteQuery(
+                self.db_path, "INSERT INTO users (name, age) VALUES (?, ?)",
+                rows, bulk=True, chunk_size=10) as report:
+            self.assertEqual(report['rows'], 25)
+            self.assertEqual(report['chunks'], 3)
+            self.assertGreater(report['rows_per_second'], 0)
+        with execute_module.ExecuteQuery(
+                self.db_path, "SELECT COUNT(*) FROM users") as results:
+            self.assertEqual(results, [(35,)])
+
+    def test_bulk_rolls_back_on_error(self):
+        """
+        Test a failing chunk leaves none of the rows committed
+        """
+        rows = [(11, "new"), (12, "new"), (1, "duplicate id")]
+        with self.assertRaises(sqlite3.IntegrityError):
+            with execute_module.ExecuteQuery(
+                    self.db_path, "INSERT INTO users (id, name) VALUES (?, ?)",
+                    rows, bulk=True, chunk_size=1):
+                pass
+        with execute_module.ExecuteQuery(
+                self.db_path, "SELECT COUNT(*) FROM users") as results:
+            self.assertEqual(results, [(10,)])
+
+    def test_async_modes(self):
+        """
+        Test AsyncExecuteQuery returns lists, streams and bulk reports
+        """
+        async def main():
+            async with execute_module.AsyncExecuteQuery(
+                    self.db_path, "INSERT INTO users (name, age) VALUES (?, ?)",
+                    [("async", 99)] * 5, bulk=True, chunk_size=2) as report:
+                self.assertEqual((report['rows'], report['chunks']), (5, 3))
+            async with execute_module.AsyncExecuteQuery(
+                    self.db_path, "SELECT COUNT(*) FROM users") as results:
+                self.assertEqual(results, [(15,)])
+            query = execute_module.AsyncExecuteQuery(
+                self.db_path, "SELECT id FROM users", stream=True,
+                chunk_size=4)
+            async with query as rows:
+                ids = [row[0] async for row in rows if row[0] <= 6]
+            self.assertEqual(ids, list(range(1, 7)))
+            self.assertIsNone(query.rows)
+
+        asyncio.run(main())
+
+    def test_async_failure_closes_connection(self):
+        """
+        Test a failing query leaves no aiosqlite worker thread behind
+        """
+        queries = [
+            execute_module.AsyncExecuteQuery(self.db_path,
+                                             "SELECT * FROM nope"),
+            execute_module.AsyncExecuteQuery(
+                self.db_path, "INSERT INTO users (id) VALUES (?)", [(1,)],
+                bulk=True),
+        ]
+
+        async def main():
+            for query in queries:
+                with self.assertRaises(sqlite3.Error):
+                    async with query:
+                        pass
+
+        before = set(threading.enumerate())
+        asyncio.run(main())
+        for thread in set(threading.enumerate()) - before:
+            thread.join(1)
+            self.assertFalse(thread.is_alive())
+        self.assertEqual([query.connection for query in queries],
+                         [None, None])
+
+
+if __name__ == '__main__':
+    unittest.main()
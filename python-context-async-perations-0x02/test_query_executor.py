@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Test query_executor module
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+
+connection_module = __import__('0-databaseconnection')
+executor_module = __import__('4-query_executor')
+
+
+class TestQueryExecutor(unittest.TestCase):
+    """
+    Test deduplication, shared scans, limits and cancellation
+    """
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                     "name TEXT, age INTEGER)")
+        conn.executemany("INSERT INTO users (name, age) VALUES (?, ?)",
+                         [("Alice", 30), ("Bob", 45), ("Charlie", None),
+                          ("Diana", 50)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        os.remove(self.db_path)
+
+    def run_batch(self, queries, **options):
+        """
+        Run queries through a QueryExecutor on a private pool
+        """
+        async def main():
+            pool = connection_module.AsyncConnectionPool(self.db_path)
+            try:
+                executor = executor_module.QueryExecutor(pool=pool, **options)
+                return await executor.run(queries)
+            finally:
+                await pool.close()
+        return asyncio.run(main())
+
+    def expected(self, query, params=()):
+        """
+        Return the rows SQLite itself gives for query
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+
+    def test_subsumed_query_shares_scan(self):
+        """
+        Test a filter of a full scan in the batch is served from its rows
+        """
+        queries = ["SELECT * FROM users",
+                   ("SELECT * FROM users WHERE age > ? AND name != 'Diana'",
+                    (40,)),
+                   "SELECT * FROM users WHERE age <= 30"]
+        results = self.run_batch(queries)
+        self.assertEqual([r.source for r in results],
+                         ['executed', 'shared', 'shared'])
+        for result, query in zip(results, queries):
+            if isinstance(query, str):
+                query = (query, ())
+            self.assertEqual(result.rows, self.expected(*query))
+            self.assertGreaterEqual(result.latency, 0)
+
+    def test_identical_queries_run_once(self):
+        """
+        Test repeated queries are marked as duplicates of one execution
+        """
+        query = ("SELECT name FROM users WHERE id = ?", [2])
+        results = self.run_batch([query, query])
+        self.assertEqual([r.source for r in results],
+                         ['executed', 'duplicate'])
+        self.assertEqual(results[1].rows, [("Bob",)])
+
+    def test_unsupported_filters_execute(self):
+        """
+        Test predicates that cannot be evaluated exactly still run in SQLite
+        """
+        results = self.run_batch([
+            "SELECT * FROM users",
+            "SELECT * FROM users WHERE age > '40'",
+            "SELECT * FROM users WHERE age > 40 OR name = 'Alice'",
+        ])
+        self.assertEqual([r.source for r in results],
+                         ['executed', 'executed', 'executed'])
+        self.assertEqual(results[1].rows,
+                         self.expected("SELECT * FROM users WHERE age > '40'"))
+
+    def test_collated_table_not_shared(self):
+        """
+        Test a table with a non-BINARY collation is filtered by SQLite
+        """
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE people (id INTEGER PRIMARY KEY, "
+                     "name TEXT COLLATE NOCASE, age INTEGER)")
+        conn.execute("INSERT INTO people (name, age) VALUES ('Bob', 45)")
+        conn.commit()
+        conn.close()
+        results = self.run_batch(["SELECT * FROM people",
+                                  "SELECT * FROM people WHERE name = 'bob'"])
+        self.assertEqual([r.source for r in results],
+                         ['executed', 'executed'])
+        self.assertEqual(results[1].rows, [(1, 'Bob', 45)])
+
+    def test_named_params(self):
+        """
+        Test mapping params are bound by name and deduplicated by value
+        """
+        query = "SELECT * FROM users WHERE id = :id"
+        results = self.run_batch(["SELECT * FROM users",
+                                  (query, {"id": 2}), (query, {"id": 2}),
+                                  (query, {"id": 4}), (query, (3,))])
+        self.assertEqual([r.rows for r in results[1:]],
+                         [[(2, 'Bob', 45)], [(2, 'Bob', 45)],
+                          [(4, 'Diana', 50)], [(3, 'Charlie', None)]])
+        self.assertEqual([r.source for r in results[1:]],
+                         ['executed', 'duplicate', 'executed', 'executed'])
+        self.assertEqual(results[1].params, {"id": 2})
+
+    def test_share_scans_disabled(self):
+        """
+        Test share_scans=False executes every distinct query
+        """
+        results = self.run_batch(["SELECT * FROM users",
+                                  "SELECT * FROM users WHERE age > 40"],
+                                 share_scans=False)
+        self.assertEqual([r.source for r in results],
+                         ['executed', 'executed'])
+
+    def test_concurrency_limit(self):
+        """
+        Test no more than concurrency queries run at once
+        """
+        async def main():
+            pool = connection_module.AsyncConnectionPool(self.db_path,
+                                                         max_size=10)
+            executor = executor_module.QueryExecutor(pool=pool, concurrency=2)
+            try:
+                await executor.run([("SELECT ?", (i,)) for i in range(20)])
+                return pool.stats()['created']
+            finally:
+                await pool.close()
+
+        self.assertEqual(asyncio.run(main()), 2)
+
+    def test_timeout_cancels(self):
+        """
+        Test a batch over its timeout raises and leaves the pool usable
+        """
+        slow = ("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 "
+                "FROM c WHERE x < 3000000) SELECT count(*) FROM c")
+
+        async def main():
+            pool = connection_module.AsyncConnectionPool(self.db_path)
+            executor = executor_module.QueryExecutor(pool=pool)
+            try:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await executor.run([slow], timeout=0.01)
+                results = await executor.run(["SELECT 1"])
+                return results[0].rows
+            finally:
+                await pool.close()
+
+        self.assertEqual(asyncio.run(main()), [(1,)])
+
+
+class TestParseScan(unittest.TestCase):
+    """
+    Test recognition of simple full scans and filters
+    """
+
+    def test_parse(self):
+        """
+        Test supported and unsupported query shapes
+        """
+        parse = executor_module.parse_scan
+        self.assertEqual(parse("select * from users"), ("users", []))
+        table, terms = parse("SELECT * FROM users WHERE age >= ?", (3,))
+        self.assertEqual((table, terms[0][0], terms[0][2]), ("users", "age", 3))
+        self.assertIsNone(parse("SELECT * FROM users ORDER BY age"))
+        self.assertIsNone(parse("SELECT name FROM users"))
+        self.assertIsNone(parse("SELECT * FROM users WHERE age > ?", ()))
+        self.assertIsNone(parse("SELECT * FROM users WHERE age > 1", (2,)))
+
+
+if __name__ == '__main__':
+    unittest.main()
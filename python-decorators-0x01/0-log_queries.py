@@ -1,16 +1,374 @@
 from datetime import datetime
 import sqlite3
+import re
+import sys
+import json
+import math
+import time
+import atexit
+import random
+import inspect
+import logging
 import functools
+import threading
+from collections import deque
 
 
-def log_queries(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        query = kwargs.get('query', '') if 'query' in kwargs else args[0] if args else ''
-        print(f"Executing SQL Query: {query}")
-        result = func(*args, **kwargs)
-        return result
-    return wrapper
+class QueryLogQueue:
+    """Bounded in-memory buffer of query records drained by a background thread
+
+    Decorated functions only append a dict to the buffer, so a slow log
+    handler never stalls a query. A record carrying a pending '_explain'
+    has its query plan captured when it is drained, so EXPLAIN does not
+    run on the caller's thread either. When the buffer is full a record is
+    dropped (the oldest one with overflow='drop_oldest', the new one with
+    overflow='drop_newest') and counted in metrics instead of blocking.
+    """
+
+    def __init__(self, maxlen=10000, flush_interval=0.1, logger=None,
+                 overflow='drop_oldest'):
+        if overflow not in ('drop_oldest', 'drop_newest'):
+            raise ValueError(f"unknown overflow policy: {overflow}")
+        self.maxlen = maxlen
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.logger = logger or _default_logger()
+        self.metrics = {'enqueued': 0, 'dropped': 0, 'sampled_out': 0,
+                        'written': 0}
+        self._buffer = deque(maxlen=maxlen)
+        self._drain_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def enqueue(self, record):
+        """Add a record without blocking, dropping one if the buffer is full"""
+        if len(self._buffer) >= self.maxlen:
+            self.metrics['dropped'] += 1
+            if self.overflow == 'drop_newest':
+                return
+        self._buffer.append(record)
+        self.metrics['enqueued'] += 1
+        if self._thread is None:
+            self._start()
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='query-log', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Write every buffered record to the logger"""
+        with self._drain_lock:
+            while True:
+                try:
+                    record = self._buffer.popleft()
+                except IndexError:
+                    return
+                explain = record.pop('_explain', None)
+                if explain is not None:
+                    record.update(capture_plan(*explain))
+                self.logger.info(json.dumps(record, default=str))
+                self.metrics['written'] += 1
+
+
+def _default_logger():
+    logger = logging.getLogger('query_log')
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+query_log = QueryLogQueue()
+atexit.register(query_log.flush)
+
+SLOW_QUERY_THRESHOLD = 0.1
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    """Reduce a query to its shape: literals become ? and IN lists (?...)
+
+    "SELECT * FROM users WHERE id IN (1, 2, 3)" and the same query with
+    other ids share the shape "SELECT * FROM users WHERE id IN (?...)".
+    """
+    shape = _STRING_LITERAL.sub('?', str(query))
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = _IN_LIST.sub('(?...)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram with roughly 5% percentile precision
+
+    Bucket i holds durations up to MIN_LATENCY * GROWTH ** i seconds, so
+    recording is a log() and a counter increment regardless of how many
+    samples have been seen.
+    """
+
+    MIN_LATENCY = 1e-6
+    GROWTH = 1.1
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, duration):
+        if duration <= self.MIN_LATENCY:
+            index = 0
+        else:
+            index = math.ceil(math.log(duration / self.MIN_LATENCY, self.GROWTH))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def percentile(self, fraction):
+        """Return the upper bound of the bucket holding the given percentile"""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self.max, self.MIN_LATENCY * self.GROWTH ** index)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total * 1000,
+            'p50_ms': self.percentile(0.50) * 1000,
+            'p95_ms': self.percentile(0.95) * 1000,
+            'p99_ms': self.percentile(0.99) * 1000,
+            'max_ms': self.max * 1000,
+        }
+
+
+class QueryStats:
+    """Latency histograms keyed by normalized query shape"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, shape, duration):
+        with self._lock:
+            histogram = self._histograms.get(shape)
+            if histogram is None:
+                histogram = self._histograms[shape] = LatencyHistogram()
+            histogram.record(duration)
+
+    def summary(self, shape):
+        with self._lock:
+            histogram = self._histograms.get(shape)
+            return histogram.summary() if histogram else None
+
+    def top(self, n=10, by='total_ms'):
+        """Return the n most expensive query shapes, sorted by the given key"""
+        with self._lock:
+            rows = [dict(shape=shape, **histogram.summary())
+                    for shape, histogram in self._histograms.items()]
+        rows.sort(key=lambda row: row[by], reverse=True)
+        return rows[:n]
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+query_stats = QueryStats()
+
+
+def top_queries(n=10, by='total_ms'):
+    """Return the n most expensive query shapes seen by log_queries"""
+    return query_stats.top(n, by)
+
+
+_plans = {}
+_plans_lock = threading.Lock()
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?\w+$")
+
+
+def _default_connect():
+    # Read-only, so explaining a plan never creates or modifies users.db
+    return sqlite3.connect('file:users.db?mode=ro', uri=True)
+
+
+def explain_query(conn, query, params=None):
+    """Run EXPLAIN QUERY PLAN for query and flag the costly steps
+
+    Returns the plan steps plus the ones scanning a whole table without an
+    index and the ones building a temporary B-tree (for ORDER BY, GROUP BY
+    or DISTINCT).
+    """
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params or ()).fetchall()
+    steps = [row[-1] for row in rows]
+    return {
+        'plan': steps,
+        'full_scans': [step for step in steps if _FULL_SCAN.match(step)],
+        'temp_btrees': [step for step in steps if 'USE TEMP B-TREE' in step],
+    }
+
+
+def capture_plan(shape, query, params=None, conn=None, connect=_default_connect):
+    """Return the query plan for shape, explaining it only the first time
+
+    The plan is computed on conn if given, otherwise on a connection from
+    connect, and cached by shape. Errors are cached too, so a query that
+    cannot be explained is not retried on every slow call.
+    """
+    with _plans_lock:
+        if shape in _plans:
+            return _plans[shape]
+    own = conn is None
+    try:
+        if own:
+            conn = connect()
+        plan = explain_query(conn, query, params)
+    except sqlite3.Error as e:
+        plan = {'error': str(e)}
+    finally:
+        if own and conn is not None:
+            conn.close()
+    with _plans_lock:
+        return _plans.setdefault(shape, plan)
+
+
+def report_slow_query(query, params, duration, connect=_default_connect,
+                      queue=None, caller=None):
+    """Log a slow-query record for callers outside log_queries
+
+    As with log_queries, the plan is captured on a connection from connect
+    when the queue drains the record, not on the caller's thread.
+    """
+    shape = normalize_query(query)
+    record = _record(query, params, time.time() - duration, duration, None,
+                     caller)
+    record['slow'] = True
+    record['shape'] = shape
+    record['_explain'] = (shape, query, params, None, connect)
+    (queue or query_log).enqueue(record)
+
+
+def _query_and_params(args, kwargs):
+    query = kwargs.get('query', '') if 'query' in kwargs else args[0] if args else ''
+    params = kwargs.get('params') if 'params' in kwargs else args[1] if len(args) > 1 else None
+    return query, params
+
+
+def _caller(depth):
+    frame = sys._getframe(depth)
+    return f"{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+def _record(query, params, started, duration, result, caller):
+    return {
+        'timestamp': datetime.fromtimestamp(started).isoformat(),
+        'query': query,
+        'params': params,
+        'duration_ms': round(duration * 1000, 3),
+        'row_count': len(result) if isinstance(result, (list, tuple)) else None,
+        'caller': caller,
+    }
+
+
+def log_queries(func=None, *, sample_rate=1.0, queue=None,
+                slow_threshold=None, stats=None, explain=True,
+                connect=_default_connect):
+    """Decorator logging each query as a structured record
+
+    Records hold the query, params, duration, row count and calling line
+    and are handed to queue (the module-level query_log by default) to be
+    written off the hot path. Only a sample_rate fraction of calls is
+    recorded; calls that raise are always recorded, with the exception in
+    error.
+
+    Every call is timed into the latency histogram of its query shape in
+    stats (query_stats by default). Calls slower than slow_threshold
+    seconds (SLOW_QUERY_THRESHOLD by default) are always logged, with
+    slow set and the query shape attached. With explain, the record also
+    carries the shape's EXPLAIN QUERY PLAN, captured once per shape on a
+    connection from connect when the queue drains the record, with full
+    scans and temp B-trees flagged.
+    """
+    def decorator(func):
+        def finish(args, kwargs, started, duration, result, caller, error):
+            query, params = _query_and_params(args, kwargs)
+            shape = normalize_query(query)
+            (stats or query_stats).record(shape, duration)
+            threshold = SLOW_QUERY_THRESHOLD if slow_threshold is None else slow_threshold
+            slow = duration >= threshold
+            log = queue or query_log
+            if (not slow and error is None and sample_rate < 1
+                    and random.random() >= sample_rate):
+                log.metrics['sampled_out'] += 1
+                return
+            record = _record(query, params, started, duration, result, caller)
+            if error is not None:
+                record['error'] = f"{type(error).__name__}: {error}"
+            if slow:
+                record['slow'] = True
+                record['shape'] = shape
+                if explain:
+                    record['_explain'] = (shape, query, params, None, connect)
+            log.enqueue(record)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                caller = _caller(2)
+                started = time.time()
+                start = time.perf_counter()
+                result = error = None
+                try:
+                    result = await func(*args, **kwargs)
+                    return result
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    finish(args, kwargs, started, time.perf_counter() - start,
+                           result, caller, error)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.time()
+            start = time.perf_counter()
+            result = error = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                finish(args, kwargs, started, time.perf_counter() - start,
+                       result, _caller(2), error)
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
 
 @log_queries
 def fetch_all_users(query):
@@ -21,4 +379,6 @@ def fetch_all_users(query):
     conn.close()
     return results
 
-users = fetch_all_users(query="SELECT * FROM users")
\ No newline at end of file
+
+if __name__ == "__main__":
+    users = fetch_all_users(query="SELECT * FROM users")
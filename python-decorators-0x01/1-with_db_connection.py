@@ -1,22 +1,355 @@
-import sqlite3 
+import sqlite3
 import functools
+import inspect
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('example.db')
+_pools = {}
+_pool_keys = {}
+_pools_lock = threading.Lock()
+
+PROFILES = {
+    'read_heavy': {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    },
+    'write_heavy': {
+        'busy_timeout': 10000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16384,
+        'mmap_size': 67108864,
+        'temp_store': 'MEMORY',
+    },
+    'bulk_load': {
+        'busy_timeout': 30000,
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -262144,
+        'mmap_size': 0,
+        'temp_store': 'MEMORY',
+    },
+}
+
+
+def apply_profile(conn, profile):
+    """Apply a named profile from PROFILES (or a dict of pragmas) to conn
+
+    busy_timeout is listed first in each profile so the journal_mode switch
+    waits for other connections instead of failing with database is locked.
+    """
+    pragmas = PROFILES[profile] if isinstance(profile, str) else profile
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+async def apply_profile_async(conn, profile):
+    """Apply a profile to an aiosqlite connection, see apply_profile"""
+    pragmas = PROFILES[profile] if isinstance(profile, str) else profile
+    for name, value in pragmas.items():
+        await conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+class StatementCacheStats:
+    """Mirror of a connection's statement cache, counting hits and misses
+
+    sqlite3 keeps the last cached_statements compiled statements per
+    connection in an LRU keyed by SQL text but does not report on it, so
+    the same LRU is replayed here from the statements executed.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def record(self, sql):
+        with self._lock:
+            if sql in self._lru:
+                self._lru.move_to_end(sql)
+                self.metrics['hits'] += 1
+                return
+            self.metrics['misses'] += 1
+            if self.capacity <= 0:
+                return
+            self._lru[sql] = None
+            if len(self._lru) > self.capacity:
+                self._lru.popitem(last=False)
+                self.metrics['evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.metrics, size=len(self._lru),
+                         capacity=self.capacity)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+class _StatementCacheCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        self.connection.statement_cache.record(sql)
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self.connection.statement_cache.record(sql)
+        return super().executemany(sql, seq_of_parameters)
+
+
+class StatementCacheConnection(sqlite3.Connection):
+    """sqlite3 connection whose statement cache use is recorded
+
+    statement_cache is a StatementCacheStats sized to cached_statements;
+    statements run through execute(), executemany() or a cursor count.
+    """
+
+    def __init__(self, *args, cached_statements=128, **kwargs):
+        super().__init__(*args, cached_statements=cached_statements, **kwargs)
+        self.statement_cache = StatementCacheStats(cached_statements)
+
+    def cursor(self, factory=_StatementCacheCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class ConnectionPool:
+    """Bounded pool of persistent SQLite connections for one database path
+
+    Connections are checked out from an idle queue and returned after use,
+    keeping their statement and page caches warm. A connection is validated
+    on checkout and replaced once it is older than max_lifetime seconds.
+    Any transaction left open by the caller is rolled back on return.
+    New connections get profile applied, see apply_profile.
+
+    Each connection keeps up to cached_statements compiled statements;
+    size it to the number of distinct hot queries (see the registry in
+    10-prepared_queries) and check statement_stats() for the hit rate.
+    """
+
+    def __init__(self, db_name, size=5, max_lifetime=300.0, timeout=5.0,
+                 profile=None, cached_statements=128, **connect_kwargs):
+        self.db_name = db_name
+        self.profile = profile
+        self.cached_statements = cached_statements
+        self.size = size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.connect_kwargs = connect_kwargs
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._born = {}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, check_same_thread=False,
+                               factory=StatementCacheConnection,
+                               cached_statements=self.cached_statements,
+                               **self.connect_kwargs)
+        try:
+            if self.profile is not None:
+                apply_profile(conn, self.profile)
+        except BaseException:
+            conn.close()
+            raise
+        self._born[conn] = time.monotonic()
+        return conn
+
+    def _discard(self, conn):
+        self._born.pop(conn, None)
         try:
-            result = func(conn, *args, **kwargs)
-        finally:
             conn.close()
-        return result
-    return wrapper 
+        except sqlite3.Error:
+            pass
+
+    def _healthy(self, conn):
+        if time.monotonic() - self._born.get(conn, 0) > self.max_lifetime:
+            return False
+        try:
+            # Plain cursor, so health checks stay out of the statement stats
+            sqlite3.Cursor(conn).execute("SELECT 1")
+        except sqlite3.Error:
+            return False
+        return True
+
+    def acquire(self):
+        """Check a connection out of the pool, opening one if none is idle"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(
+                f"no connection to {self.db_name} available "
+                f"within {self.timeout}s")
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if self._healthy(conn):
+                    return conn
+                self._discard(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back any open transaction"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+        except sqlite3.Error:
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Context manager yielding a pooled connection"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def statement_stats(self):
+        """Return statement cache hits, misses and hit rate across the pool"""
+        totals = {'hits': 0, 'misses': 0, 'evictions': 0}
+        for conn in list(self._born):
+            stats = conn.statement_cache.stats()
+            for name in totals:
+                totals[name] += stats[name]
+        lookups = totals['hits'] + totals['misses']
+        totals['hit_rate'] = totals['hits'] / lookups if lookups else 0.0
+        totals['connections'] = len(self._born)
+        totals['capacity'] = self.cached_statements
+        return totals
+
+    def close(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((name, _freeze(v)) for name, v in value.items()))
+    return value
+
+
+def _pool_key(db_name, options):
+    # Binding the signature is slow, so do it once per distinct call shape
+    raw = (db_name, _freeze(options))
+    key = _pool_keys.get(raw)
+    if key is None:
+        bound = inspect.signature(ConnectionPool).bind(db_name, **options)
+        bound.apply_defaults()
+        key = _pool_keys[raw] = _freeze(bound.arguments)
+    return key
+
+
+def get_pool(db_name, **options):
+    """Return the shared pool for db_name and options, creating it on first use
+
+    Pools are keyed by db_name together with their options (defaults filled
+    in), so a caller asking for another profile or size gets its own pool
+    instead of silently sharing one configured by the first caller.
+    """
+    key = _pool_key(db_name, options)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_name, **options)
+        return pool
+
+
+def close_pools():
+    """Close and forget every shared pool"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+def with_db_connection(func=None, *, db_name='example.db', pooled=False,
+                       profile=None, router=None, mode='read', **pool_options):
+    """Decorator to connect to SQLite database before function call
+
+    With pooled=True the connection is checked out of the shared pool for
+    db_name instead of being opened and closed around every call. profile
+    names an entry of PROFILES applied to each new connection.
+
+    Coroutine functions are given an aiosqlite connection instead, so the
+    event loop is never blocked on SQLite; pooling is not available there.
+
+    With a router (a DatabaseRouter from 12-db_router) the connection is
+    chosen by the router for mode, 'read' or 'write', and the other
+    options are ignored.
+    """
+    def decorator(func):
+        if router is not None:
+            return router.route(mode)(func)
+        if inspect.iscoroutinefunction(func):
+            if pooled:
+                raise ValueError("pooled=True is not supported for "
+                                 "coroutine functions")
+            import aiosqlite
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                async with aiosqlite.connect(db_name) as conn:
+                    if profile is not None:
+                        await apply_profile_async(conn, profile)
+                    return await func(conn, *args, **kwargs)
+            return async_wrapper
+
+        if pooled:
+            @functools.wraps(func)
+            def pooled_wrapper(*args, **kwargs):
+                pool = get_pool(db_name, profile=profile, **pool_options)
+                with pool.connection() as conn:
+                    return func(conn, *args, **kwargs)
+            return pooled_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            conn = sqlite3.connect(db_name)
+            try:
+                if profile is not None:
+                    apply_profile(conn, profile)
+                result = func(conn, *args, **kwargs)
+            finally:
+                conn.close()
+            return result
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+@with_db_connection
+def get_user_by_id(conn, user_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    return cursor.fetchone()
 
-@with_db_connection 
-def get_user_by_id(conn, user_id): 
- cursor = conn.cursor() 
- cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,)) 
- return cursor.fetchone() 
 
-user = get_user_by_id(user_id=1)
-print(user)
+if __name__ == "__main__":
+    user = get_user_by_id(user_id=1)
+    print(user)
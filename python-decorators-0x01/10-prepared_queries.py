@@ -0,0 +1,78 @@
+import functools
+import threading
+
+with_db_connection = __import__('1-with_db_connection').with_db_connection
+
+
+class QueryRegistry:
+    """Named SQL statements declared once at import time
+
+    Keeping every hot query as one exact string means each pooled
+    connection compiles it once and then finds it in its statement cache;
+    two spellings of the same query would be compiled and cached twice.
+    """
+
+    def __init__(self):
+        self._queries = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, sql):
+        """Register sql under name and return it"""
+        with self._lock:
+            existing = self._queries.get(name)
+            if existing is not None and existing != sql:
+                raise ValueError(f"query {name!r} is already registered "
+                                 "with different SQL")
+            self._queries[name] = sql
+        return sql
+
+    def __getitem__(self, name):
+        return self._queries[name]
+
+    def __contains__(self, name):
+        return name in self._queries
+
+    def __len__(self):
+        return len(self._queries)
+
+    def items(self):
+        with self._lock:
+            return list(self._queries.items())
+
+
+registry = QueryRegistry()
+
+
+def prepared_query(sql, name=None, registry=registry):
+    """Decorator declaring the SQL a function runs
+
+    The statement is registered under name (the function's qualified name
+    by default) and passed to the function as its query keyword argument,
+    so callers no longer supply it and the text never varies.
+    """
+    def decorator(func):
+        registry.register(name or func.__qualname__, sql)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return func(*args, query=sql, **kwargs)
+        wrapper.sql = sql
+        return wrapper
+    return decorator
+
+
+@prepared_query("SELECT * FROM users WHERE id = ?")
+@with_db_connection(db_name='users.db', pooled=True,
+                    cached_statements=256)
+def get_user_by_id(conn, user_id, query):
+    cursor = conn.cursor()
+    cursor.execute(query, (user_id,))
+    return cursor.fetchone()
+
+
+if __name__ == "__main__":
+    for user_id in (1, 2, 1):
+        print(get_user_by_id(user_id))
+    db = __import__('1-with_db_connection')
+    pool = db.get_pool('users.db', cached_statements=256)
+    print(pool.statement_stats())
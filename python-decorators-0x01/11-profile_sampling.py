@@ -0,0 +1,166 @@
+import os
+import sys
+import time
+import random
+import inspect
+import functools
+import threading
+from collections import Counter, defaultdict
+
+_retry = __import__('3-retry_on_failure')
+
+
+def _label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Background thread sampling the stacks of profiled calls
+
+    While at least one sampled call is running, every interval seconds the
+    sampler reads the stack of each thread running one and counts the
+    frames below the profiled call under that function's name.
+    Calls that are not sampled only pay for a random() draw, and the
+    sampler thread sleeps while no sampled call is active.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = defaultdict(Counter)
+        self.metrics = defaultdict(lambda: {'calls': 0, 'sampled': 0,
+                                            'samples': 0})
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread = None
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name='stack-sampler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._active:
+                    self._wake.wait()
+            time.sleep(self.interval)
+            self._sample()
+
+    def begin(self, name):
+        """Start sampling the calling frame's stack under name"""
+        token = object()
+        with self._lock:
+            self._active[token] = (threading.get_ident(), sys._getframe(1), name)
+            self.metrics[name]['sampled'] += 1
+            self._start()
+            self._wake.notify()
+        return token
+
+    def end(self, token):
+        with self._lock:
+            del self._active[token]
+
+    def count_call(self, name):
+        self.metrics[name]['calls'] += 1
+
+    def _sample(self):
+        frames = sys._current_frames()
+        with self._lock:
+            active = list(self._active.values())
+        for ident, root, name in active:
+            frame = frames.get(ident)
+            stack = []
+            while frame is not None and frame is not root:
+                stack.append(_label(frame.f_code))
+                frame = frame.f_back
+            if frame is None:
+                # Not on the stack right now, e.g. a suspended coroutine
+                continue
+            stack.append(name)
+            with self._lock:
+                self.stacks[name][';'.join(reversed(stack))] += 1
+                self.metrics[name]['samples'] += 1
+
+    def collapsed(self, name=None):
+        """Return sampled stacks in the collapsed format read by flamegraph
+        tools, one "frame;frame;frame count" line per distinct stack"""
+        with self._lock:
+            names = [name] if name is not None else sorted(self.stacks)
+            lines = [f"{stack} {count}"
+                     for fn in names
+                     for stack, count in sorted(self.stacks[fn].items())]
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write_collapsed(self, path, name=None):
+        """Write collapsed(name) to path"""
+        with open(path, 'w') as f:
+            f.write(self.collapsed(name))
+
+    def stats(self):
+        """Return calls, sampled calls and stack samples per function"""
+        with self._lock:
+            return {name: dict(metrics) for name, metrics in self.metrics.items()}
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.metrics.clear()
+
+
+profiler = StackSampler()
+
+
+def profile_sampled(func=None, *, sample_rate=0.01, sampler=None):
+    """Decorator profiling a sample_rate fraction of calls
+
+    Sampled calls are stack-sampled by sampler (the shared profiler by
+    default) and aggregated per function; export them with
+    profiler.write_collapsed(path). For coroutine functions only time
+    spent running on the event loop thread is sampled, not time spent
+    awaiting.
+    """
+    def decorator(func):
+        target = sampler or profiler
+        name = func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                target.count_call(name)
+                if random.random() >= sample_rate:
+                    return await func(*args, **kwargs)
+                token = target.begin(name)
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    target.end(token)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            target.count_call(name)
+            if random.random() >= sample_rate:
+                return func(*args, **kwargs)
+            token = target.begin(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                target.end(token)
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+fetch_users_with_retry = profile_sampled(_retry.fetch_users_with_retry,
+                                         sample_rate=0.1)
+
+
+if __name__ == "__main__":
+    for _ in range(1000):
+        fetch_users_with_retry()
+    print(profiler.stats())
+    profiler.write_collapsed('fetch_users.folded')
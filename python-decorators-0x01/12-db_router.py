@@ -0,0 +1,191 @@
+import sqlite3
+import inspect
+import functools
+import threading
+
+_db = __import__('1-with_db_connection')
+
+STRATEGIES = ('round_robin', 'least_busy')
+
+# Pragmas that write to the database file, refused by mode=ro connections
+PERSISTENT_PRAGMAS = frozenset({
+    'journal_mode', 'auto_vacuum', 'page_size', 'user_version',
+    'application_id', 'incremental_vacuum', 'wal_checkpoint', 'optimize',
+})
+
+
+def read_only_profile(profile):
+    """Return the pragmas of profile that a read-only connection can apply"""
+    pragmas = _db.PROFILES[profile] if isinstance(profile, str) else profile
+    return {name: value for name, value in pragmas.items()
+            if name.lower() not in PERSISTENT_PRAGMAS}
+
+
+class _Target:
+    """One database a router can send calls to"""
+
+    def __init__(self, db_name, read_only, profile):
+        self.db_name = db_name
+        self.read_only = read_only
+        if read_only and profile is not None:
+            profile = read_only_profile(profile)
+        self.profile = profile
+        # mode=ro lets SQLite refuse writes that were routed here by mistake
+        self.database = f"file:{db_name}?mode=ro" if read_only else db_name
+        self.calls = 0
+        self.in_flight = 0
+
+    def connect(self):
+        conn = sqlite3.connect(self.database, uri=self.read_only)
+        try:
+            if self.profile is not None:
+                _db.apply_profile(conn, self.profile)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def pool(self, **pool_options):
+        return _db.get_pool(self.database, uri=self.read_only,
+                            profile=self.profile, **pool_options)
+
+    async def connect_async(self):
+        import aiosqlite
+        conn = await aiosqlite.connect(self.database, uri=self.read_only)
+        try:
+            if self.profile is not None:
+                await _db.apply_profile_async(conn, self.profile)
+        except BaseException:
+            # the caller never gets conn to close, and its thread would linger
+            await conn.close()
+            raise
+        return conn
+
+
+class DatabaseRouter:
+    """Sends read-only calls to replicas and writes to the primary
+
+    replicas are SQLite files kept in sync with primary (for example
+    copies refreshed with Connection.backup), opened read-only unless
+    read_only_replicas is False. Reads pick a replica in turn with
+    strategy='round_robin' or the one with the fewest calls in flight with
+    strategy='least_busy'; with no replicas they go to the primary.
+    profile applies to primary connections and replica_profile to replica
+    connections, see apply_profile; read-only replicas skip the
+    PERSISTENT_PRAGMAS (such as journal_mode) that would write the file.
+    pooled and pool_options are passed on to get_pool as in
+    with_db_connection.
+    """
+
+    def __init__(self, primary, replicas=(), strategy='round_robin',
+                 read_only_replicas=True, profile=None, replica_profile=None,
+                 pooled=False, **pool_options):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"unknown routing strategy: {strategy}")
+        self.strategy = strategy
+        self.pooled = pooled
+        self.pool_options = pool_options
+        self.primary = _Target(primary, False, profile)
+        self.replicas = [_Target(name, read_only_replicas, replica_profile)
+                         for name in replicas]
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _pick(self, mode):
+        with self._lock:
+            if mode == 'write' or not self.replicas:
+                target = self.primary
+            elif self.strategy == 'least_busy':
+                target = min(self.replicas, key=lambda t: t.in_flight)
+            else:
+                target = self.replicas[self._next % len(self.replicas)]
+                self._next += 1
+            target.calls += 1
+            target.in_flight += 1
+        return target
+
+    def _done(self, target):
+        with self._lock:
+            target.in_flight -= 1
+
+    def route(self, mode='read'):
+        """Decorator passing the function a connection chosen for mode
+
+        mode is 'read' for functions that only query and 'write' for
+        anything that modifies the database.
+        """
+        if mode not in ('read', 'write'):
+            raise ValueError(f"unknown mode: {mode}")
+
+        def decorator(func):
+            if inspect.iscoroutinefunction(func):
+                if self.pooled:
+                    raise ValueError("pooled=True is not supported for "
+                                     "coroutine functions")
+
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    target = self._pick(mode)
+                    try:
+                        conn = await target.connect_async()
+                        try:
+                            return await func(conn, *args, **kwargs)
+                        finally:
+                            await conn.close()
+                    finally:
+                        self._done(target)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                target = self._pick(mode)
+                try:
+                    if self.pooled:
+                        with target.pool(**self.pool_options).connection() as conn:
+                            return func(conn, *args, **kwargs)
+                    conn = target.connect()
+                    try:
+                        return func(conn, *args, **kwargs)
+                    finally:
+                        conn.close()
+                finally:
+                    self._done(target)
+            return wrapper
+        return decorator
+
+    @property
+    def read(self):
+        return self.route('read')
+
+    @property
+    def write(self):
+        return self.route('write')
+
+    def stats(self):
+        """Return calls and calls in flight per database"""
+        with self._lock:
+            return {target.db_name: {'calls': target.calls,
+                                     'in_flight': target.in_flight}
+                    for target in [self.primary] + self.replicas}
+
+
+router = DatabaseRouter('users.db')
+
+
+@router.read
+def fetch_all_users(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users")
+    return cursor.fetchall()
+
+
+@router.write
+def update_user_email(conn, user_id, new_email):
+    cursor = conn.cursor()
+    cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
+    conn.commit()
+
+
+if __name__ == "__main__":
+    print(fetch_all_users())
+    print(router.stats())
@@ -1,32 +1,160 @@
-import sqlite3
 import functools
+import inspect
+import threading
 
 
-def with_db_connection(func):
-    """Decorator to connect to SQLite database before function call"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            result = func(conn, *args, **kwargs)
-            return result
-        finally:
-            conn.close()
-    return wrapper
+_connection = __import__('1-with_db_connection')
+
+
+def with_db_connection(func=None, **options):
+    """Decorator to connect to SQLite database before function call
+
+    Accepts the same options as 1-with_db_connection, e.g. pooled=True.
+    """
+    options.setdefault('db_name', 'users.db')
+    return _connection.with_db_connection(func, **options)
+
+
+class _Operation:
+    """One caller's call waiting to be run in a group commit"""
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Batch:
+    """Operations collected by one leader within the commit window"""
+    def __init__(self):
+        self.operations = []
+        self.full = threading.Event()
+
+
+class _GroupCommit:
+    """Runs calls arriving within a short window in one shared transaction
+
+    The first caller of a batch becomes its leader: it waits up to window
+    seconds (or until max_batch calls have joined), then runs every call on
+    its own connection, each inside a savepoint, and commits once. A call
+    that raises is rolled back to its savepoint and only that caller sees
+    the error. Batches commit one at a time, so the next batch fills while
+    the previous one is committing.
+    """
+
+    def __init__(self, window, max_batch):
+        self.window = window
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._batch = None
 
+    def submit(self, conn, func, args, kwargs):
+        operation = _Operation(func, args, kwargs)
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _Batch()
+            batch.operations.append(operation)
+            if len(batch.operations) >= self.max_batch:
+                batch.full.set()
+                self._batch = None
 
-def transactional(func):
-    """Decorator to manage database transactions"""
-    @functools.wraps(func)
-    def wrapper(conn, *args, **kwargs):
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._batch is batch:
+                    self._batch = None
+            with self._commit_lock:
+                self._run(conn, batch.operations)
+        else:
+            operation.done.wait()
+
+        if operation.error is not None:
+            raise operation.error
+        return operation.result
+
+    @staticmethod
+    def _run(conn, operations):
         try:
-            result = func(conn, *args, **kwargs)
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            for operation in operations:
+                conn.execute("SAVEPOINT group_commit_op")
+                try:
+                    operation.result = operation.func(
+                        conn, *operation.args, **operation.kwargs)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO group_commit_op")
+                    operation.error = e
+                conn.execute("RELEASE group_commit_op")
             conn.commit()
-            return result
-        except Exception:
+        except BaseException as e:
             conn.rollback()
+            for operation in operations:
+                if operation.error is None:
+                    operation.result = None
+                    operation.error = e
             raise
-    return wrapper
+        finally:
+            for operation in operations:
+                operation.done.set()
+
+
+def transactional(func=None, *, group_commit=False, window=0.005,
+                  max_batch=100):
+    """Decorator to manage database transactions
+
+    With group_commit=True, calls made from different threads within window
+    seconds (up to max_batch of them) share one transaction and one commit.
+    Each caller still gets its own result or exception. Wrapped functions
+    must not commit or roll back themselves in this mode.
+
+    Coroutine functions get an async wrapper awaiting the aiosqlite
+    connection's commit and rollback; group commit is sync only.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            if group_commit:
+                raise ValueError("group_commit is not supported for "
+                                 "coroutine functions")
+
+            @functools.wraps(func)
+            async def async_wrapper(conn, *args, **kwargs):
+                try:
+                    result = await func(conn, *args, **kwargs)
+                    await conn.commit()
+                    return result
+                except Exception:
+                    await conn.rollback()
+                    raise
+            return async_wrapper
+
+        if group_commit:
+            group = _GroupCommit(window, max_batch)
+
+            @functools.wraps(func)
+            def group_wrapper(conn, *args, **kwargs):
+                return group.submit(conn, func, args, kwargs)
+            return group_wrapper
+
+        @functools.wraps(func)
+        def wrapper(conn, *args, **kwargs):
+            try:
+                result = func(conn, *args, **kwargs)
+                conn.commit()
+                return result
+            except Exception:
+                conn.rollback()
+                raise
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
 
 
 @with_db_connection
@@ -36,4 +164,5 @@ def update_user_email(conn, user_id, new_email):
     cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
 
 
-update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
+if __name__ == "__main__":
+    update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
@@ -1,32 +1,159 @@
 import time
+import random
+import asyncio
+import inspect
 import sqlite3
 import functools
+import threading
 
 
-def with_db_connection(func):
-    """Decorator to connect to SQLite database before function call"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-    return wrapper
+_connection = __import__('1-with_db_connection')
 
 
-def retry_on_failure(retries=3, delay=2):
-    """Decorator to retry a function if it fails"""
+def with_db_connection(func=None, **options):
+    """Decorator to connect to SQLite database before function call
+
+    Accepts the same options as 1-with_db_connection, e.g. pooled=True.
+    """
+    options.setdefault('db_name', 'users.db')
+    return _connection.with_db_connection(func, **options)
+
+
+TRANSIENT_SQLITE_ERRORS = ('database is locked', 'database table is locked',
+                           'database is busy', 'disk i/o error')
+
+_metrics_lock = threading.Lock()
+retry_metrics = {
+    'calls': 0,
+    'attempts': 0,
+    'retries': 0,
+    'give_ups': 0,
+    'not_retryable': 0,
+    'budget_exhausted': 0,
+}
+
+
+def _count(name):
+    with _metrics_lock:
+        retry_metrics[name] += 1
+
+
+def get_retry_metrics():
+    """Return a snapshot of the process-wide retry metrics"""
+    with _metrics_lock:
+        return dict(retry_metrics)
+
+
+def is_retryable(error):
+    """Return True for errors worth retrying, such as a locked database
+
+    Syntax errors, constraint violations and other programming errors are
+    not retried since they fail the same way every time.
+    """
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error).lower()
+        return any(text in message for text in TRANSIENT_SQLITE_ERRORS)
+    if isinstance(error, sqlite3.Error):
+        return False
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+class RetryBudget:
+    """Caps retries to a fraction of calls, shared by every decorated function
+
+    Each call deposits ratio tokens, up to max_tokens, and each retry spends
+    one. When the bucket is empty failures are returned to the caller
+    instead of being retried, so an outage cannot multiply the load on the
+    database by the retry count.
+    """
+
+    def __init__(self, ratio=0.2, max_tokens=10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        """Spend one retry token, returning False if none is left"""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+retry_budget = RetryBudget()
+
+
+def backoff_delay(attempt, delay, max_delay, jitter=True):
+    """Return the sleep before retry number attempt (0-based)
+
+    The delay doubles with each attempt up to max_delay. With jitter the
+    actual sleep is drawn uniformly below that ceiling ("full jitter") so
+    workers that failed together do not retry together.
+    """
+    ceiling = min(max_delay, delay * 2 ** attempt)
+    return random.uniform(0, ceiling) if jitter else ceiling
+
+
+def retry_on_failure(retries=3, delay=2, max_delay=30, jitter=True,
+                     retry_if=is_retryable, budget=retry_budget):
+    """Decorator to retry a function if it fails
+
+    Only errors accepted by retry_if are retried, with exponential backoff
+    starting at delay seconds. Retries are also limited by budget; pass
+    budget=None to disable it. Coroutine functions back off with
+    asyncio.sleep instead of time.sleep.
+    """
+    def should_retry(error, attempt):
+        if not retry_if(error):
+            _count('not_retryable')
+            return False
+        if attempt == retries - 1:
+            _count('give_ups')
+            return False
+        if budget is not None and not budget.withdraw():
+            _count('budget_exhausted')
+            return False
+        _count('retries')
+        return True
+
+    def start_call():
+        _count('calls')
+        if budget is not None:
+            budget.deposit()
+
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start_call()
+                for attempt in range(retries):
+                    _count('attempts')
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as e:
+                        if not should_retry(e, attempt):
+                            raise
+                    await asyncio.sleep(backoff_delay(attempt, delay,
+                                                      max_delay, jitter))
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
+            start_call()
             for attempt in range(retries):
+                _count('attempts')
                 try:
                     return func(*args, **kwargs)
-                except Exception:
-                    if attempt == retries - 1:
+                except Exception as e:
+                    if not should_retry(e, attempt):
                         raise
-                    time.sleep(delay)
+                time.sleep(backoff_delay(attempt, delay, max_delay, jitter))
         return wrapper
     return decorator
 
@@ -39,5 +166,6 @@ def fetch_users_with_retry(conn):
     return cursor.fetchall()
 
 
-users = fetch_users_with_retry()
-print(users)
+if __name__ == "__main__":
+    users = fetch_users_with_retry()
+    print(users)
@@ -1,32 +1,260 @@
 import time
 import sqlite3
+import asyncio
+import inspect
 import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_log = __import__('0-log_queries')
 
 query_cache = {}
+_cache_lock = threading.Lock()
+_inflight = {}
+_async_inflight = {}
+_MISS = object()
+
+refresh_metrics = {
+    'refreshes': 0,
+    'failures': 0,
+    'skipped': 0,
+    'total_time': 0.0,
+    'max_time': 0.0,
+    'last_time': 0.0,
+}
+
+
+_connection = __import__('1-with_db_connection')
+
+
+def with_db_connection(func=None, **options):
+    """Decorator to connect to SQLite database before function call
+
+    Accepts the same options as 1-with_db_connection, e.g. pooled=True.
+    """
+    options.setdefault('db_name', 'users.db')
+    return _connection.with_db_connection(func, **options)
+
+
+class _Flight:
+    """A query being computed by one caller that other callers wait on"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _cache_key(args, kwargs):
+    """Return the query string used as cache key"""
+    return kwargs.get('query') or (args[1] if len(args) > 1 else None)
+
+
+def _lookup(query, ttl, stale_ttl=None):
+    """Return (result, stale) for query, or (_MISS, False) if unusable
+
+    An entry older than ttl is still returned, flagged stale, while it is
+    younger than stale_ttl.
+    """
+    entry = query_cache.get(query)
+    if entry is None:
+        return _MISS, False
+    result, stored_at = entry
+    if ttl is None:
+        return result, False
+    age = time.monotonic() - stored_at
+    if age < ttl:
+        return result, False
+    if stale_ttl is not None and age < stale_ttl:
+        return result, True
+    return _MISS, False
+
+
+def _store(query, result):
+    with _cache_lock:
+        query_cache[query] = (result, time.monotonic())
+
+
+def _record_refresh(elapsed, failed):
+    with _cache_lock:
+        refresh_metrics['refreshes'] += 1
+        if failed:
+            refresh_metrics['failures'] += 1
+        refresh_metrics['total_time'] += elapsed
+        refresh_metrics['last_time'] = elapsed
+        refresh_metrics['max_time'] = max(refresh_metrics['max_time'], elapsed)
+
+
+def get_refresh_metrics():
+    """Return a snapshot of background refresh metrics"""
+    with _cache_lock:
+        stats = dict(refresh_metrics)
+    done = stats['refreshes']
+    stats['avg_time'] = stats['total_time'] / done if done else 0.0
+    return stats
+
+
+def _default_connect():
+    return sqlite3.connect('users.db')
+
+
+def _check_slow(query, duration, connect, slow_threshold):
+    """Report a slow query execution to the query log, which explains it"""
+    if slow_threshold is None:
+        slow_threshold = _log.SLOW_QUERY_THRESHOLD
+    if duration < slow_threshold:
+        return
+    if connect is _default_connect:
+        # Explaining needs no write access to users.db
+        connect = _log._default_connect
+    _log.report_slow_query(query, None, duration, connect=connect)
+
+
+def cache_query(func=None, *, ttl=None, stale_ttl=None, max_refreshes=2,
+                connect=_default_connect, slow_threshold=None):
+    """Decorator to cache results of database queries based on the query string
+
+    Concurrent misses for the same query are coalesced: the first caller runs
+    the query and the others wait for its result instead of hitting the
+    database themselves.
+
+    With stale_ttl set, entries between ttl and stale_ttl old are served
+    immediately and refreshed in the background on a connection from
+    connect, with at most max_refreshes refreshes running at once.
+
+    Executions slower than slow_threshold (the log_queries default if None)
+    are reported to the query log with their EXPLAIN QUERY PLAN.
+
+    Coroutine functions are handed to async_cache_query (without the
+    stale-while-revalidate refresh).
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            return async_cache_query(func, ttl=ttl)
+
+        executor = None
+        refreshing = set()
+
+        def refresh(query, args, kwargs):
+            start = time.perf_counter()
+            failed = False
+            conn = None
+            try:
+                conn = connect()
+                _store(query, func(conn, *args[1:], **kwargs))
+                _check_slow(query, time.perf_counter() - start, connect,
+                            slow_threshold)
+            except Exception:
+                failed = True
+            finally:
+                if conn is not None:
+                    conn.close()
+                with _cache_lock:
+                    refreshing.discard(query)
+                _record_refresh(time.perf_counter() - start, failed)
+
+        def schedule_refresh(query, args, kwargs):
+            nonlocal executor
+            with _cache_lock:
+                if query in refreshing:
+                    return
+                if len(refreshing) >= max_refreshes:
+                    refresh_metrics['skipped'] += 1
+                    return
+                refreshing.add(query)
+                if executor is None:
+                    executor = ThreadPoolExecutor(
+                        max_workers=max_refreshes,
+                        thread_name_prefix='cache-refresh')
+            executor.submit(refresh, query, args, kwargs)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            query = _cache_key(args, kwargs)
+            with _cache_lock:
+                result, stale = _lookup(query, ttl, stale_ttl)
+                if result is _MISS:
+                    flight = _inflight.get(query)
+                    leader = flight is None
+                    if leader:
+                        flight = _inflight[query] = _Flight()
+
+            if result is not _MISS:
+                if stale:
+                    schedule_refresh(query, args, kwargs)
+                return result
+
+            if not leader:
+                flight.done.wait()
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result
+
+            try:
+                start = time.perf_counter()
+                flight.result = func(*args, **kwargs)
+                _store(query, flight.result)
+                _check_slow(query, time.perf_counter() - start, connect,
+                            slow_threshold)
+                return flight.result
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with _cache_lock:
+                    _inflight.pop(query, None)
+                flight.done.set()
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def async_cache_query(func=None, *, ttl=None):
+    """Async counterpart of cache_query for coroutine functions
+
+    Waiters share the leader's result through an asyncio future. If the
+    leader is cancelled, one of the waiters takes over the query.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            query = _cache_key(args, kwargs)
+            while True:
+                result, _ = _lookup(query, ttl)
+                if result is not _MISS:
+                    return result
+                flight = _async_inflight.get(query)
+                if flight is None:
+                    break
+                try:
+                    return await asyncio.shield(flight)
+                except asyncio.CancelledError:
+                    if not flight.cancelled():
+                        raise
+
+            flight = asyncio.get_running_loop().create_future()
+            _async_inflight[query] = flight
+            try:
+                result = await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                flight.cancel()
+                raise
+            except BaseException as e:
+                flight.set_exception(e)
+                flight.exception()
+                raise
+            else:
+                _store(query, result)
+                flight.set_result(result)
+                return result
+            finally:
+                _async_inflight.pop(query, None)
+        return wrapper
 
-def with_db_connection(func):
-    """Decorator to connect to SQLite database before function call"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-    return wrapper
-
-
-def cache_query(func):
-    """Decorator to cache results of database queries based on the query string"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        query = kwargs.get('query') or (args[1] if len(args) > 1 else None)
-        if query in query_cache:
-            return query_cache[query]
-        result = func(*args, **kwargs)
-        query_cache[query] = result
-        return result
-    return wrapper
+    if func is not None:
+        return decorator(func)
+    return decorator
 
 
 @with_db_connection
@@ -37,8 +265,9 @@ def fetch_users_with_cache(conn, query):
     return cursor.fetchall()
 
 
-users = fetch_users_with_cache(query="SELECT * FROM users")
+if __name__ == "__main__":
+    users = fetch_users_with_cache(query="SELECT * FROM users")
 
-users_again = fetch_users_with_cache(query="SELECT * FROM users")
-print(users)
-print(users_again)
+    users_again = fetch_users_with_cache(query="SELECT * FROM users")
+    print(users)
+    print(users_again)
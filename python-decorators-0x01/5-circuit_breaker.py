@@ -0,0 +1,166 @@
+import time
+import sqlite3
+import inspect
+import functools
+import threading
+from collections import deque
+
+_retry = __import__('3-retry_on_failure')
+with_db_connection = _retry.with_db_connection
+retry_on_failure = _retry.retry_on_failure
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the function while the circuit is open"""
+
+
+def is_outage_error(error):
+    """Return True for errors that suggest the database is unavailable
+
+    Locked, unreadable or missing database files count; mistakes in the
+    query itself (syntax errors, unknown tables) do not.
+    """
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error).lower()
+        return 'syntax error' not in message and 'no such' not in message
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+class CircuitBreaker:
+    """Fails fast while the failure rate of recent calls is too high
+
+    The breaker watches the outcome of the last window calls. Once at least
+    minimum_calls have been seen and the share of failures reaches
+    failure_threshold it opens, and calls raise CircuitOpenError without
+    touching the database. After cooldown seconds it lets up to
+    half_open_calls trial calls through: a success closes it again, a
+    failure reopens it for another cooldown.
+    """
+
+    def __init__(self, failure_threshold=0.5, minimum_calls=10, window=20,
+                 cooldown=30.0, half_open_calls=1, is_failure=is_outage_error):
+        self.failure_threshold = failure_threshold
+        self.minimum_calls = minimum_calls
+        self.cooldown = cooldown
+        self.half_open_calls = half_open_calls
+        self.is_failure = is_failure
+        self.state = CLOSED
+        self.rejected = 0
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trials = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self.cooldown - (time.monotonic() - self._opened_at)
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(
+                        f"circuit open, retry in {remaining:.1f}s")
+                self.state = HALF_OPEN
+                self._trials = 0
+            if self.state == HALF_OPEN:
+                if self._trials >= self.half_open_calls:
+                    self.rejected += 1
+                    raise CircuitOpenError("circuit half-open, trial in progress")
+                self._trials += 1
+
+    def _after_call(self, failed):
+        with self._lock:
+            if failed is None:
+                if self.state == HALF_OPEN:
+                    self._trials -= 1
+                return
+            if self.state == HALF_OPEN:
+                if failed:
+                    self._open()
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                return
+            if self.state == OPEN:
+                return
+            self._outcomes.append(failed)
+            if len(self._outcomes) >= self.minimum_calls:
+                rate = sum(self._outcomes) / len(self._outcomes)
+                if rate >= self.failure_threshold:
+                    self._open()
+
+    def stats(self):
+        """Return the current state and recent failure rate"""
+        with self._lock:
+            seen = len(self._outcomes)
+            return {
+                'state': self.state,
+                'recent_calls': seen,
+                'failure_rate': sum(self._outcomes) / seen if seen else 0.0,
+                'rejected': self.rejected,
+            }
+
+    def __call__(self, func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                self._before_call()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    self._after_call(self.is_failure(e))
+                    raise
+                except BaseException:
+                    self._after_call(None)
+                    raise
+                self._after_call(False)
+                return result
+            async_wrapper.breaker = self
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self._before_call()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self._after_call(self.is_failure(e))
+                raise
+            except BaseException:
+                self._after_call(None)
+                raise
+            self._after_call(False)
+            return result
+        wrapper.breaker = self
+        return wrapper
+
+
+def circuit_breaker(**options):
+    """Decorator wrapping a function in a new CircuitBreaker
+
+    Place it above with_db_connection and retry_on_failure so that an open
+    circuit skips both the connection and the retry delays.
+    """
+    return CircuitBreaker(**options)
+
+
+@circuit_breaker(failure_threshold=0.5, minimum_calls=4, cooldown=10)
+@with_db_connection
+@retry_on_failure(retries=3, delay=1)
+def fetch_users_with_breaker(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users")
+    return cursor.fetchall()
+
+
+if __name__ == "__main__":
+    users = fetch_users_with_breaker()
+    print(users)
@@ -0,0 +1,192 @@
+import asyncio
+import inspect
+import contextvars
+from contextlib import contextmanager
+from operator import itemgetter
+
+with_db_connection = __import__('1-with_db_connection').with_db_connection
+
+_current_scope = contextvars.ContextVar('batch_scope', default=None)
+
+
+class BatchScope:
+    """Per-request state: results already loaded and keys waiting to load"""
+    def __init__(self):
+        self.cache = {}
+        self.pending = {}
+
+
+@contextmanager
+def batch_scope():
+    """Scope (typically one request) within which lookups are batched
+
+    Keys requested with load() inside the scope are fetched together the
+    first time any of their values is needed, and each key is fetched at
+    most once per scope.
+    """
+    scope = BatchScope()
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+class Deferred:
+    """The pending result of BatchLoader.load"""
+    def __init__(self, loader, key, scope):
+        self.loader = loader
+        self.key = key
+        self.scope = scope
+        self.done = False
+        self.value = None
+        self.error = None
+
+    def get(self):
+        """Return the value, fetching every pending key of its loader first"""
+        if not self.done:
+            self.loader._dispatch(self.scope)
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class BatchLoader:
+    """Turns many point lookups into one batched lookup
+
+    batch_fn receives a list of keys and returns the matching rows, e.g.
+    from a single "WHERE id IN (...)" query; rows are matched back to keys
+    with key (the first column by default) and a key with no row gets
+    None. At most max_batch keys are sent per batch_fn call.
+
+    Synchronous callers batch inside a batch_scope() with load() or
+    load_many(). Coroutines awaiting aload() are batched per event loop
+    tick; a non-async batch_fn then runs in a worker thread.
+    """
+
+    def __init__(self, batch_fn, key=itemgetter(0), max_batch=500):
+        self.batch_fn = batch_fn
+        self.key = key
+        self.max_batch = max_batch
+        self._async_batches = {}
+        self._async_tasks = set()
+
+    def __call__(self, key):
+        return self.load(key).get()
+
+    def load(self, key, scope=None):
+        """Queue key for the next batch and return a Deferred result"""
+        scope = scope or _current_scope.get() or BatchScope()
+        deferred = scope.cache.get((self, key))
+        if deferred is None:
+            deferred = scope.cache[(self, key)] = Deferred(self, key, scope)
+            scope.pending.setdefault(self, []).append(deferred)
+        return deferred
+
+    def load_many(self, keys):
+        """Return the values for keys, fetched in as few batches as possible"""
+        scope = _current_scope.get() or BatchScope()
+        deferreds = [self.load(key, scope) for key in keys]
+        return [deferred.get() for deferred in deferreds]
+
+    def _split(self, keys, rows):
+        found = {self.key(row): row for row in rows}
+        return [found.get(key) for key in keys]
+
+    def _chunks(self, items):
+        for start in range(0, len(items), self.max_batch):
+            yield items[start:start + self.max_batch]
+
+    def _dispatch(self, scope):
+        pending = scope.pending.pop(self, [])
+        for chunk in self._chunks(pending):
+            keys = [deferred.key for deferred in chunk]
+            try:
+                values = self._split(keys, self.batch_fn(keys))
+            except Exception as e:
+                for deferred in chunk:
+                    deferred.error = e
+                    deferred.done = True
+                    scope.cache.pop((self, deferred.key), None)
+                continue
+            for deferred, value in zip(chunk, values):
+                deferred.value = value
+                deferred.done = True
+
+    async def aload(self, key):
+        """Return the value for key, batched with other keys of this tick"""
+        scope = _current_scope.get()
+        cache_key = (self, key, 'async')
+        if scope is not None and cache_key in scope.cache:
+            return await scope.cache[cache_key]
+        loop = asyncio.get_running_loop()
+        batch = self._async_batches.get(loop)
+        if batch is None:
+            batch = self._async_batches[loop] = {}
+            loop.call_soon(self._start_dispatch, loop)
+        future = batch.get(key)
+        if future is None:
+            future = batch[key] = loop.create_future()
+        if scope is not None:
+            scope.cache[cache_key] = future
+            future.add_done_callback(
+                lambda f: self._evict_failed(scope, cache_key, f))
+        return await future
+
+    @staticmethod
+    def _evict_failed(scope, cache_key, future):
+        # As in _dispatch, a failed key is retried by the next load
+        if future.cancelled() or future.exception() is not None:
+            if scope.cache.get(cache_key) is future:
+                del scope.cache[cache_key]
+
+    def _start_dispatch(self, loop):
+        # The loop only keeps a weak reference to running tasks
+        task = loop.create_task(self._adispatch(loop))
+        self._async_tasks.add(task)
+        task.add_done_callback(self._async_tasks.discard)
+
+    async def aload_many(self, keys):
+        """Return the values for keys from one batched lookup"""
+        return await asyncio.gather(*(self.aload(key) for key in keys))
+
+    async def _adispatch(self, loop):
+        batch = self._async_batches.pop(loop)
+        keys = list(batch)
+        for chunk in self._chunks(keys):
+            try:
+                if inspect.iscoroutinefunction(self.batch_fn):
+                    rows = await self.batch_fn(chunk)
+                else:
+                    rows = await asyncio.to_thread(self.batch_fn, chunk)
+                values = self._split(chunk, rows)
+            except Exception as e:
+                for key in chunk:
+                    if not batch[key].done():
+                        batch[key].set_exception(e)
+                continue
+            for key, value in zip(chunk, values):
+                if not batch[key].done():
+                    batch[key].set_result(value)
+
+
+def batch_loader(key=itemgetter(0), max_batch=500):
+    """Decorator turning a batch lookup function into a BatchLoader"""
+    def decorator(batch_fn):
+        return BatchLoader(batch_fn, key=key, max_batch=max_batch)
+    return decorator
+
+
+@batch_loader()
+@with_db_connection
+def get_user_by_id(conn, user_ids):
+    placeholders = ", ".join("?" for _ in user_ids)
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT * FROM users WHERE id IN ({placeholders})", user_ids)
+    return cursor.fetchall()
+
+
+if __name__ == "__main__":
+    with batch_scope():
+        users = get_user_by_id.load_many([1, 2, 3])
+    print(users)
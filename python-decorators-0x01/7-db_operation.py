@@ -0,0 +1,137 @@
+import time
+import random
+import sqlite3
+import functools
+
+_log = __import__('0-log_queries')
+_db = __import__('1-with_db_connection')
+_retry = __import__('3-retry_on_failure')
+
+
+def _freeze(params):
+    if isinstance(params, dict):
+        return frozenset(params.items())
+    if isinstance(params, list):
+        return tuple(params)
+    return params
+
+
+def db_operation(func=None, *, db_name='users.db', pooled=False, profile=None,
+                 transactional=False, retries=1, delay=0.1, max_delay=30,
+                 retry_if=_retry.is_retryable, cache=False, ttl=None,
+                 log=False, sample_rate=1.0, slow_threshold=None,
+                 explain=True, queue=None):
+    """Single decorator combining the python-decorators-0x01 features
+
+    Equivalent to stacking with_db_connection, transactional,
+    retry_on_failure, cache_query and log_queries, but the options are
+    resolved once at decoration time into one wrapper, so each call costs
+    one extra frame and one pass over args instead of five. Cached results
+    are returned before a connection is opened, and retries roll back and
+    rerun the whole transaction on the same connection.
+
+    The query used for caching and logging is the query keyword argument or
+    else the first positional argument after the connection, and params is
+    taken the same way; results are cached per (query, params). Logged
+    records have the log_queries schema and honour sample_rate and
+    explain the same way, the plan of a slow query being captured on a
+    read-only connection to db_name when the queue drains the record. The
+    cache is private to the operation and has no single-flight or
+    background refresh; use cache_query directly when those are needed.
+    """
+    def decorator(func):
+        if pooled:
+            pool = _db.get_pool(db_name, profile=profile)
+        results = {}
+        budget = _retry.retry_budget
+        threshold = _log.SLOW_QUERY_THRESHOLD if slow_threshold is None else slow_threshold
+        log_queue = queue or _log.query_log
+        perf_counter = time.perf_counter
+        monotonic = time.monotonic
+
+        def connect_read_only():
+            return sqlite3.connect(f"file:{db_name}?mode=ro", uri=True)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if cache or log:
+                query, params = _log._query_and_params(args, kwargs)
+            if log:
+                caller = _log._caller(2)
+            if cache:
+                key = (query, _freeze(params))
+                entry = results.get(key)
+                if entry is not None and (ttl is None or monotonic() - entry[1] < ttl):
+                    return entry[0]
+            if pooled:
+                conn = pool.acquire()
+            else:
+                conn = sqlite3.connect(db_name)
+                if profile is not None:
+                    _db.apply_profile(conn, profile)
+            if retries > 1:
+                budget.deposit()
+            try:
+                attempt = 0
+                while True:
+                    if log:
+                        started = time.time()
+                        start = perf_counter()
+                    try:
+                        result = func(conn, *args, **kwargs)
+                        if transactional:
+                            conn.commit()
+                        break
+                    except Exception as e:
+                        if transactional:
+                            conn.rollback()
+                        attempt += 1
+                        if (attempt >= retries or not retry_if(e)
+                                or not budget.withdraw()):
+                            raise
+                        time.sleep(_retry.backoff_delay(attempt - 1, delay,
+                                                        max_delay))
+                if log:
+                    duration = perf_counter() - start
+                    shape = _log.normalize_query(query)
+                    _log.query_stats.record(shape, duration)
+                    slow = duration >= threshold
+                    if (not slow and sample_rate < 1
+                            and random.random() >= sample_rate):
+                        log_queue.metrics['sampled_out'] += 1
+                    else:
+                        record = _log._record(query, params, started, duration,
+                                              result, caller)
+                        if slow:
+                            record['slow'] = True
+                            record['shape'] = shape
+                            if explain:
+                                record['_explain'] = (shape, query, params,
+                                                      None, connect_read_only)
+                        log_queue.enqueue(record)
+            finally:
+                if pooled:
+                    pool.release(conn)
+                else:
+                    conn.close()
+            if cache:
+                results[key] = (result, monotonic())
+            return result
+        wrapper.cache = results
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+@db_operation(transactional=True, retries=3, delay=1, cache=True, log=True)
+def fetch_users(conn, query):
+    cursor = conn.cursor()
+    cursor.execute(query)
+    return cursor.fetchall()
+
+
+if __name__ == "__main__":
+    users = fetch_users(query="SELECT * FROM users")
+    print(users)
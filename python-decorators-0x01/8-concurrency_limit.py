@@ -0,0 +1,245 @@
+import time
+import asyncio
+import inspect
+import functools
+import threading
+from collections import deque
+
+with_db_connection = __import__('1-with_db_connection').with_db_connection
+
+
+class ConcurrencyLimitError(TimeoutError):
+    """Raised when a call cannot get a slot in time or the queue is full"""
+
+
+class _Lane:
+    """A limited number of concurrent calls plus a bounded queue of waiters
+
+    Threads and coroutines draw on the same semaphore. Waiting coroutines
+    cannot block on it, so they park on a future that release() resolves,
+    then try again.
+    """
+
+    def __init__(self, name, limit, max_waiting, timeout):
+        self.name = name
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(limit)
+        self._async_waiters = deque()
+        self._lock = threading.Lock()
+        self.metrics = {
+            'acquired': 0,
+            'in_flight': 0,
+            'waiting': 0,
+            'peak_waiting': 0,
+            'rejected': 0,
+            'timeouts': 0,
+            'total_wait': 0.0,
+            'max_wait': 0.0,
+        }
+
+    def _enter_queue(self):
+        with self._lock:
+            if self.metrics['waiting'] >= self.max_waiting:
+                self.metrics['rejected'] += 1
+                raise ConcurrencyLimitError(
+                    f"{self.name} queue full ({self.max_waiting} waiting)")
+            self.metrics['waiting'] += 1
+            self.metrics['peak_waiting'] = max(self.metrics['peak_waiting'],
+                                               self.metrics['waiting'])
+
+    def _leave_queue(self, waited, acquired):
+        with self._lock:
+            self.metrics['waiting'] -= 1
+            if not acquired:
+                self.metrics['timeouts'] += 1
+                return
+            self.metrics['acquired'] += 1
+            self.metrics['in_flight'] += 1
+            self.metrics['total_wait'] += waited
+            self.metrics['max_wait'] = max(self.metrics['max_wait'], waited)
+
+    def _acquired_now(self):
+        with self._lock:
+            self.metrics['acquired'] += 1
+            self.metrics['in_flight'] += 1
+
+    def _timed_out(self):
+        return ConcurrencyLimitError(
+            f"no {self.name} slot free within {self.timeout}s")
+
+    def _done(self):
+        with self._lock:
+            self.metrics['in_flight'] -= 1
+
+    def acquire(self):
+        if self._slots.acquire(blocking=False):
+            self._acquired_now()
+            return
+        self._enter_queue()
+        start = time.perf_counter()
+        acquired = self._slots.acquire(timeout=self.timeout)
+        self._leave_queue(time.perf_counter() - start, acquired)
+        if not acquired:
+            raise self._timed_out()
+
+    def release(self):
+        self._done()
+        self._slots.release()
+        self._wake_async()
+
+    def _wake_async(self):
+        with self._lock:
+            while self._async_waiters:
+                loop, future = self._async_waiters.popleft()
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(self._woken, future)
+                    return
+
+    def _woken(self, future):
+        if future.done():
+            # That waiter gave up already; pass the free slot on
+            self._wake_async()
+        else:
+            future.set_result(None)
+
+    def _forget(self, waiter):
+        with self._lock:
+            try:
+                self._async_waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    async def _wait_async(self, start):
+        loop = asyncio.get_running_loop()
+        while True:
+            waiter = (loop, loop.create_future())
+            # Queue up before trying, so a release in between still wakes us
+            with self._lock:
+                self._async_waiters.append(waiter)
+            if self._slots.acquire(blocking=False):
+                self._forget(waiter)
+                return True
+            remaining = None
+            if self.timeout is not None:
+                remaining = start + self.timeout - time.perf_counter()
+                if remaining <= 0:
+                    self._forget(waiter)
+                    return False
+            try:
+                await asyncio.wait_for(waiter[1], remaining)
+            except asyncio.TimeoutError:
+                self._forget(waiter)
+                return False
+            except BaseException:
+                self._forget(waiter)
+                if waiter[1].done() and not waiter[1].cancelled():
+                    self._wake_async()
+                raise
+
+    async def acquire_async(self):
+        if self._slots.acquire(blocking=False):
+            self._acquired_now()
+            return
+        self._enter_queue()
+        start = time.perf_counter()
+        acquired = False
+        try:
+            acquired = await self._wait_async(start)
+        finally:
+            self._leave_queue(time.perf_counter() - start, acquired)
+        if not acquired:
+            raise self._timed_out()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.metrics)
+        waits = stats['acquired']
+        stats['avg_wait'] = stats['total_wait'] / waits if waits else 0.0
+        return stats
+
+
+class ConcurrencyLimiter:
+    """Caps concurrent database calls with separate read and write lanes
+
+    SQLite allows one writer at a time, so by default writes get a single
+    lane slot and queue in Python, where the wait is bounded and measured,
+    instead of piling up on "database is locked". Each lane holds at most
+    max_waiting queued callers; a caller that finds the queue full, or
+    waits longer than timeout seconds, gets ConcurrencyLimitError.
+    Threads and coroutines on any event loop share each lane's slots, so
+    writers=1 admits a single writer in total.
+    """
+
+    def __init__(self, readers=8, writers=1, max_waiting=64, timeout=5.0):
+        self.lanes = {
+            'read': _Lane('read', readers, max_waiting, timeout),
+            'write': _Lane('write', writers, max_waiting, timeout),
+        }
+
+    def limit(self, mode='read'):
+        """Decorator running the function inside the given lane"""
+        lane = self.lanes[mode]
+
+        def decorator(func):
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    await lane.acquire_async()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        lane.release()
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                lane.acquire()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    lane.release()
+            return wrapper
+        return decorator
+
+    @property
+    def read(self):
+        return self.limit('read')
+
+    @property
+    def write(self):
+        return self.limit('write')
+
+    def stats(self):
+        """Return queue depth, wait time and rejection metrics per lane"""
+        return {mode: lane.stats() for mode, lane in self.lanes.items()}
+
+
+db_limiter = ConcurrencyLimiter()
+
+
+def limit_concurrency(mode='read', limiter=None):
+    """Decorator limiting concurrency with limiter (db_limiter by default)"""
+    return (limiter or db_limiter).limit(mode)
+
+
+@limit_concurrency('write')
+@with_db_connection(db_name='users.db')
+def update_user_email(conn, user_id, new_email):
+    cursor = conn.cursor()
+    cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
+    conn.commit()
+
+
+@limit_concurrency('read')
+@with_db_connection(db_name='users.db')
+def fetch_all_users(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users")
+    return cursor.fetchall()
+
+
+if __name__ == "__main__":
+    print(fetch_all_users())
+    print(db_limiter.stats())
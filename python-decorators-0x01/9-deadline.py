@@ -0,0 +1,134 @@
+import time
+import asyncio
+import sqlite3
+import inspect
+import functools
+import contextvars
+
+with_db_connection = __import__('1-with_db_connection').with_db_connection
+
+PROGRESS_STEPS = 1000
+
+_deadline = contextvars.ContextVar('deadline', default=None)
+_guarded = contextvars.ContextVar('guarded_connections', default=frozenset())
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call runs out of its time budget"""
+
+
+def remaining():
+    """Return the seconds left before the current deadline, or None"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def _expired():
+    deadline = _deadline.get()
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def _is_connection(obj):
+    return isinstance(obj, sqlite3.Connection)
+
+
+def _is_async_connection(obj):
+    return hasattr(obj, 'set_progress_handler') and hasattr(obj, 'interrupt')
+
+
+def _raise_if_interrupted(error):
+    if isinstance(error, sqlite3.OperationalError) and 'interrupted' in str(error):
+        raise DeadlineExceeded("deadline exceeded, query interrupted") from error
+
+
+def with_deadline(seconds=None):
+    """Decorator giving the call (and everything it calls) a time budget
+
+    The deadline is kept in a context variable, so nested decorated calls
+    share it and can only tighten it; with seconds=None a call just
+    inherits the caller's deadline. When the first argument is a SQLite
+    connection, a progress handler interrupts any statement still running
+    at the deadline and the call raises DeadlineExceeded. Place it below
+    with_db_connection so it receives the connection.
+    """
+    def decorator(func):
+        def enter():
+            current = _deadline.get()
+            deadline = current
+            if seconds is not None:
+                mine = time.monotonic() + seconds
+                deadline = mine if current is None else min(current, mine)
+            if deadline is not None and time.monotonic() >= deadline:
+                raise DeadlineExceeded("deadline exceeded before call")
+            return deadline
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                deadline = enter()
+                token = _deadline.set(deadline)
+                conn = args[0] if args and _is_async_connection(args[0]) else None
+                try:
+                    if conn is not None and deadline is not None:
+                        await conn.set_progress_handler(
+                            lambda: time.monotonic() >= deadline, PROGRESS_STEPS)
+                    try:
+                        if deadline is None:
+                            return await func(*args, **kwargs)
+                        return await asyncio.wait_for(
+                            func(*args, **kwargs), deadline - time.monotonic())
+                    except asyncio.TimeoutError:
+                        if deadline is None or time.monotonic() < deadline:
+                            # A TimeoutError of func's own, not our deadline
+                            raise
+                        if conn is not None:
+                            await conn.interrupt()
+                        raise DeadlineExceeded("deadline exceeded") from None
+                    except sqlite3.OperationalError as e:
+                        _raise_if_interrupted(e)
+                        raise
+                finally:
+                    _deadline.reset(token)
+                    if conn is not None and deadline is not None:
+                        outer = _deadline.get()
+                        if outer is None:
+                            await conn.set_progress_handler(None, PROGRESS_STEPS)
+                        else:
+                            await conn.set_progress_handler(
+                                lambda: time.monotonic() >= outer, PROGRESS_STEPS)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            token = _deadline.set(enter())
+            conn = args[0] if args and _is_connection(args[0]) else None
+            guard_token = None
+            if conn is not None and id(conn) not in _guarded.get():
+                conn.set_progress_handler(_expired, PROGRESS_STEPS)
+                guard_token = _guarded.set(_guarded.get() | {id(conn)})
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                _raise_if_interrupted(e)
+                raise
+            finally:
+                if guard_token is not None:
+                    _guarded.reset(guard_token)
+                    conn.set_progress_handler(None, PROGRESS_STEPS)
+                _deadline.reset(token)
+        return wrapper
+    return decorator
+
+
+@with_db_connection(db_name='users.db')
+@with_deadline(2.0)
+def fetch_all_users(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users")
+    return cursor.fetchall()
+
+
+if __name__ == "__main__":
+    print(fetch_all_users())
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the python-decorators-0x01 decorators
+
+Run from this directory: python3 benchmarks.py
+"""
+import os
+import logging
+import sqlite3
+import tempfile
+import threading
+import time
+
+log_module = __import__('0-log_queries')
+db_module = __import__('1-with_db_connection')
+tx_module = __import__('2-transactional')
+retry_module = __import__('3-retry_on_failure')
+cache_module = __import__('4-cache_query')
+op_module = __import__('7-db_operation')
+
+
+def make_users_db(rows=1000):
+    """Create a temporary users database and return its path"""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    conn = sqlite3.connect(path)
+    conn.execute("""
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        email TEXT NOT NULL,
+        age INTEGER NOT NULL
+    )
+    """)
+    conn.executemany(
+        "INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
+        ((f"user{i}", f"user{i}@example.com", 18 + i % 60)
+         for i in range(rows)))
+    conn.commit()
+    conn.close()
+    return path
+
+
+def calls_per_second(func, duration=1.0, *args, **kwargs):
+    """Call func repeatedly for duration seconds and return the call rate"""
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + duration
+    while time.perf_counter() < deadline:
+        func(*args, **kwargs)
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+
+def bench_pooled_connection(path, duration=1.0):
+    """Compare per-call connect/close against the pooled mode"""
+    def get_user_by_id(conn, user_id):
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+        return cursor.fetchone()
+
+    plain = db_module.with_db_connection(get_user_by_id, db_name=path)
+    pooled = db_module.with_db_connection(get_user_by_id, db_name=path,
+                                          pooled=True)
+    results = {
+        'connect per call': calls_per_second(plain, duration, 1),
+        'pooled': calls_per_second(pooled, duration, 1),
+    }
+    db_module.close_pools()
+    return results
+
+
+def bench_profiles(duration=1.0, readers=4):
+    """Measure reads and writes per second under each connection profile
+
+    Each profile gets a fresh database, one writer thread committing small
+    updates and several reader threads running a range scan.
+    """
+    results = {}
+    for profile in (None, 'read_heavy', 'write_heavy', 'bulk_load'):
+        path = make_users_db()
+        counts = {'reads': 0, 'writes': 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        @db_module.with_db_connection(db_name=path, profile=profile)
+        def reader(conn):
+            done = 0
+            while not stop.is_set():
+                conn.execute(
+                    "SELECT COUNT(*) FROM users WHERE age > ?", (40,)
+                ).fetchone()
+                done += 1
+            with lock:
+                counts['reads'] += done
+
+        @db_module.with_db_connection(db_name=path, profile=profile)
+        def writer(conn):
+            done = 0
+            while not stop.is_set():
+                conn.execute("UPDATE users SET age = age + 1 WHERE id = ?",
+                             (1 + done % 1000,))
+                conn.commit()
+                done += 1
+            with lock:
+                counts['writes'] += done
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)]
+        threads.append(threading.Thread(target=writer))
+        for t in threads:
+            t.start()
+        time.sleep(duration)
+        stop.set()
+        for t in threads:
+            t.join()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        results[profile or 'default'] = (counts['reads'] / duration,
+                                         counts['writes'] / duration)
+    return results
+
+
+def bench_fused_stack(path, duration=1.0):
+    """Compare the five stacked decorators against one db_operation wrapper
+
+    Both forms use a pooled connection and a log queue that discards its
+    records, so the difference is the per-call wrapper overhead.
+    """
+    logger = logging.getLogger('benchmarks.null')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    queue = log_module.QueryLogQueue(logger=logger)
+
+    def fetch(conn, query):
+        return conn.execute(query).fetchone()
+
+    query = "SELECT 1"
+    stacked = db_module.with_db_connection(db_name=path, pooled=True)(
+        tx_module.transactional(
+            retry_module.retry_on_failure(retries=3, delay=0.01, budget=None)(
+                log_module.log_queries(queue=queue)(fetch))))
+    fused = op_module.db_operation(
+        fetch, db_name=path, pooled=True, transactional=True, retries=3,
+        delay=0.01, log=True, queue=queue)
+
+    cache_module.query_cache.clear()
+    stacked_cached = db_module.with_db_connection(db_name=path, pooled=True)(
+        tx_module.transactional(
+            retry_module.retry_on_failure(retries=3, delay=0.01, budget=None)(
+                cache_module.cache_query(
+                    log_module.log_queries(queue=queue)(fetch)))))
+    fused_cached = op_module.db_operation(
+        fetch, db_name=path, pooled=True, transactional=True, retries=3,
+        delay=0.01, cache=True, log=True, queue=queue)
+
+    results = {
+        'stacked': calls_per_second(stacked, duration, query=query),
+        'db_operation': calls_per_second(fused, duration, query=query),
+        'stacked, cache hit': calls_per_second(stacked_cached, duration,
+                                               query=query),
+        'db_operation, hit': calls_per_second(fused_cached, duration,
+                                              query=query),
+    }
+    db_module.close_pools()
+    cache_module.query_cache.clear()
+    return results
+
+
+def report(title, results):
+    """Print benchmark results relative to the first entry"""
+    print(title)
+    baseline = next(iter(results.values()))
+    for name, rate in results.items():
+        print(f"  {name:<20} {rate:>12,.0f} calls/s  x{rate / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    db_path = make_users_db()
+    try:
+        report("with_db_connection: get_user_by_id",
+               bench_pooled_connection(db_path))
+        report("five stacked decorators vs db_operation",
+               bench_fused_stack(db_path))
+    finally:
+        os.remove(db_path)
+
+    print("with_db_connection profiles: 4 readers + 1 writer")
+    for name, (reads, writes) in bench_profiles().items():
+        print(f"  {name:<20} {reads:>10,.0f} reads/s {writes:>10,.0f} writes/s")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test the async paths of the python-decorators-0x01 decorators
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+
+db_module = __import__('1-with_db_connection')
+tx_module = __import__('2-transactional')
+retry_module = __import__('3-retry_on_failure')
+cache_module = __import__('4-cache_query')
+breaker_module = __import__('5-circuit_breaker')
+
+
+class TestAsyncDecorators(unittest.TestCase):
+    """
+    Test each decorator picks its async path for coroutine functions
+    """
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                     "email TEXT)")
+        conn.execute("INSERT INTO users (email) VALUES ('a@example.com')")
+        conn.commit()
+        conn.close()
+        cache_module.query_cache.clear()
+
+    def tearDown(self):
+        cache_module.query_cache.clear()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.db_path + suffix):
+                os.remove(self.db_path + suffix)
+
+    def test_connection_and_transaction(self):
+        """
+        Test an aiosqlite connection is injected and the update committed
+        """
+        @db_module.with_db_connection(db_name=self.db_path,
+                                      profile='read_heavy')
+        @tx_module.transactional
+        async def update_user_email(conn, user_id, new_email):
+            await conn.execute("UPDATE users SET email = ? WHERE id = ?",
+                               (new_email, user_id))
+
+        asyncio.run(update_user_email(1, "b@example.com"))
+        conn = sqlite3.connect(self.db_path)
+        email = conn.execute("SELECT email FROM users").fetchone()[0]
+        conn.close()
+        self.assertEqual(email, "b@example.com")
+
+    def test_transaction_rolled_back(self):
+        """
+        Test a failing coroutine is rolled back
+        """
+        @db_module.with_db_connection(db_name=self.db_path)
+        @tx_module.transactional
+        async def update_then_fail(conn):
+            await conn.execute("UPDATE users SET email = 'x'")
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(update_then_fail())
+        conn = sqlite3.connect(self.db_path)
+        email = conn.execute("SELECT email FROM users").fetchone()[0]
+        conn.close()
+        self.assertEqual(email, "a@example.com")
+
+    @patch('asyncio.sleep', new_callable=AsyncMock)
+    def test_retry_uses_asyncio_sleep(self, mock_sleep):
+        """
+        Test retries of a coroutine back off without blocking the loop
+        """
+        attempts = []
+
+        @retry_module.retry_on_failure(retries=3, delay=1, budget=None)
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise sqlite3.OperationalError("database is locked")
+            return "rows"
+
+        self.assertEqual(asyncio.run(flaky()), "rows")
+        self.assertEqual(mock_sleep.await_count, 2)
+
+    def test_cache_and_breaker_stack(self):
+        """
+        Test cache_query and circuit_breaker wrap coroutines
+        """
+        executions = []
+
+        @breaker_module.circuit_breaker()
+        @db_module.with_db_connection(db_name=self.db_path)
+        @cache_module.cache_query
+        async def fetch(conn, query):
+            executions.append(query)
+            async with conn.execute(query) as cursor:
+                return await cursor.fetchall()
+
+        async def main():
+            return await asyncio.gather(
+                *(fetch(query="SELECT email FROM users") for _ in range(5)))
+
+        results = asyncio.run(main())
+        self.assertEqual(results, [[("a@example.com",)]] * 5)
+        self.assertEqual(len(executions), 1)
+
+    def test_pooled_coroutine_rejected(self):
+        """
+        Test pooled mode refuses coroutine functions
+        """
+        with self.assertRaises(ValueError):
+            @db_module.with_db_connection(pooled=True)
+            async def fetch(conn):
+                pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test batch_loader module
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+
+loader_module = __import__('6-batch_loader')
+
+
+class TestBatchLoader(unittest.TestCase):
+    """
+    Test point lookups are merged into IN queries
+    """
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.executemany("INSERT INTO users (id, name) VALUES (?, ?)",
+                         [(i, f"user{i}") for i in range(1, 11)])
+        conn.commit()
+        conn.close()
+        self.batches = []
+
+        @loader_module.batch_loader(max_batch=4)
+        @loader_module.with_db_connection(db_name=self.db_path)
+        def get_user_by_id(conn, user_ids):
+            self.batches.append(list(user_ids))
+            placeholders = ", ".join("?" for _ in user_ids)
+            return conn.execute(
+                f"SELECT * FROM users WHERE id IN ({placeholders})",
+                user_ids).fetchall()
+        self.get_user_by_id = get_user_by_id
+
+    def tearDown(self):
+        os.remove(self.db_path)
+
+    def test_scope_batches_loads(self):
+        """
+        Test loads within a scope are fetched in one query
+        """
+        with loader_module.batch_scope():
+            pending = [self.get_user_by_id.load(i) for i in (3, 1, 2)]
+            users = [p.get() for p in pending]
+        self.assertEqual(users, [(3, "user3"), (1, "user1"), (2, "user2")])
+        self.assertEqual(self.batches, [[3, 1, 2]])
+
+    def test_scope_caches_results(self):
+        """
+        Test a key is fetched once per scope and again in a new scope
+        """
+        with loader_module.batch_scope():
+            self.get_user_by_id(1)
+            self.get_user_by_id(1)
+            self.get_user_by_id.load_many([1, 2])
+        with loader_module.batch_scope():
+            self.get_user_by_id(1)
+        self.assertEqual(self.batches, [[1], [2], [1]])
+
+    def test_missing_key_and_max_batch(self):
+        """
+        Test batches are split at max_batch and unknown keys give None
+        """
+        users = self.get_user_by_id.load_many([1, 2, 3, 4, 5, 99])
+        self.assertEqual(users[-1], None)
+        self.assertEqual(self.batches, [[1, 2, 3, 4], [5, 99]])
+
+    def test_error_reaches_every_caller(self):
+        """
+        Test a failing batch raises for every key in it
+        """
+        @loader_module.batch_loader()
+        def broken(user_ids):
+            raise sqlite3.OperationalError("database is locked")
+
+        with loader_module.batch_scope():
+            pending = [broken.load(1), broken.load(2)]
+            for p in pending:
+                with self.assertRaises(sqlite3.OperationalError):
+                    p.get()
+
+    def test_async_tick_batching(self):
+        """
+        Test coroutines awaiting in the same tick share one query
+        """
+        async def handler():
+            with loader_module.batch_scope():
+                users = await asyncio.gather(
+                    *(self.get_user_by_id.aload(i) for i in (1, 2, 3, 2)))
+                again = await self.get_user_by_id.aload(1)
+            return users, again
+
+        users, again = asyncio.run(handler())
+        self.assertEqual([u[0] for u in users], [1, 2, 3, 2])
+        self.assertEqual(again, (1, "user1"))
+        self.assertEqual(self.batches, [[1, 2, 3]])
+
+    def test_async_batch_fn(self):
+        """
+        Test a coroutine batch function is awaited directly
+        """
+        @loader_module.batch_loader(key=lambda row: row['id'])
+        async def get_rows(ids):
+            self.batches.append(ids)
+            return [{'id': i} for i in ids]
+
+        async def main():
+            return await get_rows.aload_many([5, 6])
+
+        self.assertEqual(asyncio.run(main()), [{'id': 5}, {'id': 6}])
+        self.assertEqual(self.batches, [[5, 6]])
+
+    def test_async_error_not_cached(self):
+        """
+        Test a failed async batch is retried by the next aload in the scope
+        """
+        attempts = []
+
+        @loader_module.batch_loader()
+        async def flaky(user_ids):
+            attempts.append(list(user_ids))
+            if len(attempts) == 1:
+                raise sqlite3.OperationalError("database is locked")
+            return [(i,) for i in user_ids]
+
+        async def main():
+            with loader_module.batch_scope():
+                with self.assertRaises(sqlite3.OperationalError):
+                    await flaky.aload(1)
+                again = await flaky.aload(1)
+                cached = await flaky.aload(1)
+            return again, cached
+
+        self.assertEqual(asyncio.run(main()), ((1,), (1,)))
+        self.assertEqual(attempts, [[1], [1]])
+        self.assertEqual(flaky._async_tasks, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
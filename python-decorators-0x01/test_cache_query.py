@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Test cache_query module
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+cache_module = __import__('4-cache_query')
+
+
+class CacheQueryTestCase(unittest.TestCase):
+    """
+    Base class providing a users database and an execution counter
+    """
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.executemany("INSERT INTO users (name) VALUES (?)",
+                         [("Alice",), ("Bob",)])
+        conn.commit()
+        conn.close()
+        self.executions = []
+        self.exec_lock = threading.Lock()
+        cache_module.query_cache.clear()
+
+    def tearDown(self):
+        cache_module.query_cache.clear()
+        os.remove(self.db_path)
+
+    def run_query(self, query):
+        """
+        Run query against the test database, recording the execution
+        """
+        with self.exec_lock:
+            self.executions.append(query)
+        time.sleep(0.05)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(query).fetchall()
+        finally:
+            conn.close()
+
+
+class TestCacheQueryStampede(CacheQueryTestCase):
+    """
+    Test single-flight coalescing of threaded callers
+    """
+
+    def test_one_execution_per_key(self):
+        """
+        Test concurrent misses run each query once
+        """
+        @cache_module.cache_query
+        def fetch(conn, query):
+            return self.run_query(query)
+
+        queries = ["SELECT * FROM users", "SELECT name FROM users"]
+        barrier = threading.Barrier(20)
+        results = []
+
+        def worker(i):
+            barrier.wait()
+            results.append(fetch(None, query=queries[i % 2]))
+
+        threads = [threading.Thread(target=worker, args=(i,))
+                   for i in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(sorted(self.executions), sorted(queries))
+        self.assertEqual(len(results), 20)
+
+    def test_error_shared_and_not_cached(self):
+        """
+        Test waiters receive the leader's error and the next call retries
+        """
+        calls = []
+
+        @cache_module.cache_query
+        def fetch(conn, query):
+            calls.append(query)
+            time.sleep(0.05)
+            raise sqlite3.OperationalError("database is locked")
+
+        barrier = threading.Barrier(5)
+        errors = []
+
+        def worker():
+            barrier.wait()
+            try:
+                fetch(None, query="SELECT 1")
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(errors), 5)
+        with self.assertRaises(sqlite3.OperationalError):
+            fetch(None, query="SELECT 1")
+        self.assertEqual(len(calls), 2)
+
+    def test_ttl_expiry(self):
+        """
+        Test expired entries are recomputed
+        """
+        @cache_module.cache_query(ttl=0.01)
+        def fetch(conn, query):
+            return self.run_query(query)
+
+        fetch(None, query="SELECT * FROM users")
+        fetch(None, query="SELECT * FROM users")
+        self.assertEqual(len(self.executions), 1)
+        time.sleep(0.02)
+        fetch(None, query="SELECT * FROM users")
+        self.assertEqual(len(self.executions), 2)
+
+
+class TestStaleWhileRevalidate(CacheQueryTestCase):
+    """
+    Test stale entries are served while refreshed in the background
+    """
+
+    def connect(self):
+        """
+        Open a connection usable from the refresh thread
+        """
+        return sqlite3.connect(self.db_path, check_same_thread=False)
+
+    def wait_for_refreshes(self, count):
+        """
+        Wait until count background refreshes have completed
+        """
+        deadline = time.monotonic() + 2
+        while cache_module.get_refresh_metrics()['refreshes'] < count:
+            if time.monotonic() > deadline:
+                self.fail("background refresh did not finish")
+            time.sleep(0.01)
+
+    def setUp(self):
+        super().setUp()
+        for key in cache_module.refresh_metrics:
+            cache_module.refresh_metrics[key] = 0
+
+    def test_stale_served_then_refreshed(self):
+        """
+        Test a soft-expired entry is returned at once and then replaced
+        """
+        @cache_module.cache_query(ttl=0.01, stale_ttl=10, connect=self.connect)
+        def fetch(conn, query):
+            return self.run_query(query)
+
+        query = "SELECT name FROM users"
+        first = fetch(None, query=query)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO users (name) VALUES ('Carol')")
+        conn.commit()
+        conn.close()
+        time.sleep(0.02)
+
+        start = time.perf_counter()
+        stale = fetch(None, query=query)
+        self.assertLess(time.perf_counter() - start, 0.05)
+        self.assertEqual(stale, first)
+
+        self.wait_for_refreshes(1)
+        self.assertEqual(fetch(None, query=query)[-1], ("Carol",))
+        metrics = cache_module.get_refresh_metrics()
+        self.assertEqual(metrics['failures'], 0)
+        self.assertGreater(metrics['avg_time'], 0)
+
+    def test_hard_ttl_blocks(self):
+        """
+        Test entries past stale_ttl are recomputed in the caller
+        """
+        @cache_module.cache_query(ttl=0.01, stale_ttl=0.02,
+                                  connect=self.connect)
+        def fetch(conn, query):
+            return self.run_query(query)
+
+        fetch(None, query="SELECT 1")
+        time.sleep(0.03)
+        fetch(None, query="SELECT 1")
+        self.assertEqual(len(self.executions), 2)
+        self.assertEqual(cache_module.get_refresh_metrics()['refreshes'], 0)
+
+    def test_refresh_concurrency_limit(self):
+        """
+        Test refreshes beyond max_refreshes are skipped
+        """
+        @cache_module.cache_query(ttl=0.01, stale_ttl=10, max_refreshes=1,
+                                  connect=self.connect)
+        def fetch(conn, query):
+            return self.run_query(query)
+
+        fetch(None, query="SELECT 1")
+        fetch(None, query="SELECT 2")
+        time.sleep(0.02)
+        fetch(None, query="SELECT 1")
+        fetch(None, query="SELECT 2")
+        self.wait_for_refreshes(1)
+        self.assertEqual(cache_module.get_refresh_metrics()['skipped'], 1)
+
+    def test_refresh_connect_failure(self):
+        """
+        Test a refresh whose connect fails is counted and can be retried
+        """
+        connects = []
+
+        def connect():
+            connects.append(1)
+            raise sqlite3.OperationalError("unable to open database file")
+
+        @cache_module.cache_query(ttl=0.01, stale_ttl=10, connect=connect)
+        def fetch(conn, query):
+            return self.run_query(query)
+
+        fetch(None, query="SELECT 1")
+        time.sleep(0.02)
+        self.assertEqual(fetch(None, query="SELECT 1"), [(1,)])
+        self.wait_for_refreshes(1)
+        self.assertEqual(fetch(None, query="SELECT 1"), [(1,)])
+        self.wait_for_refreshes(2)
+        metrics = cache_module.get_refresh_metrics()
+        self.assertEqual(metrics['failures'], 2)
+        self.assertEqual(len(connects), 2)
+
+
+class TestAsyncCacheQueryStampede(CacheQueryTestCase):
+    """
+    Test single-flight coalescing of asyncio callers
+    """
+
+    def test_one_execution_per_key(self):
+        """
+        Test concurrent coroutine misses run each query once
+        """
+        @cache_module.async_cache_query
+        async def fetch(conn, query):
+            return await asyncio.to_thread(self.run_query, query)
+
+        queries = ["SELECT * FROM users", "SELECT name FROM users"]
+
+        async def main():
+            return await asyncio.gather(
+                *(fetch(None, query=queries[i % 2]) for i in range(20)))
+
+        results = asyncio.run(main())
+        self.assertEqual(sorted(self.executions), sorted(queries))
+        self.assertEqual(results[0], [(1, "Alice"), (2, "Bob")])
+
+    def test_leader_cancelled(self):
+        """
+        Test a waiter takes over when the leader is cancelled
+        """
+        @cache_module.async_cache_query
+        async def fetch(conn, query):
+            self.executions.append(query)
+            await asyncio.sleep(0.05)
+            return "rows"
+
+        async def main():
+            leader = asyncio.ensure_future(fetch(None, query="q"))
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(fetch(None, query="q"))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await waiter
+
+        self.assertEqual(asyncio.run(main()), "rows")
+        self.assertEqual(len(self.executions), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
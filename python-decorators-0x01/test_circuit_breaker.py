@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test circuit_breaker module
+"""
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+breaker_module = __import__('5-circuit_breaker')
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """
+    Test state transitions of CircuitBreaker
+    """
+
+    def setUp(self):
+        self.fail_next = True
+        self.calls = 0
+
+        @breaker_module.circuit_breaker(failure_threshold=0.5,
+                                        minimum_calls=4, window=4,
+                                        cooldown=30)
+        def query():
+            self.calls += 1
+            if self.fail_next:
+                raise sqlite3.OperationalError("unable to open database file")
+            return "rows"
+        self.query = query
+        self.breaker = query.breaker
+
+    def trip(self):
+        """
+        Fail enough calls to open the circuit
+        """
+        for _ in range(4):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.query()
+
+    def test_opens_and_fails_fast(self):
+        """
+        Test the circuit opens at the threshold and then skips the function
+        """
+        self.trip()
+        self.assertEqual(self.breaker.state, breaker_module.OPEN)
+        with self.assertRaises(breaker_module.CircuitOpenError):
+            self.query()
+        self.assertEqual(self.calls, 4)
+        self.assertEqual(self.breaker.stats()['rejected'], 1)
+
+    def test_below_threshold_stays_closed(self):
+        """
+        Test occasional failures do not open the circuit
+        """
+        for i in range(8):
+            self.fail_next = i % 4 == 0
+            try:
+                self.query()
+            except sqlite3.OperationalError:
+                pass
+        self.assertEqual(self.breaker.state, breaker_module.CLOSED)
+
+    def test_query_errors_ignored(self):
+        """
+        Test syntax errors do not count as failures
+        """
+        @breaker_module.circuit_breaker(minimum_calls=2, window=2)
+        def bad_query():
+            raise sqlite3.OperationalError('near "SELEC": syntax error')
+
+        for _ in range(5):
+            with self.assertRaises(sqlite3.OperationalError):
+                bad_query()
+        self.assertEqual(bad_query.breaker.state, breaker_module.CLOSED)
+
+    @patch('time.monotonic')
+    def test_half_open_recovers(self, mock_monotonic):
+        """
+        Test a successful trial call after the cooldown closes the circuit
+        """
+        mock_monotonic.return_value = 100.0
+        self.trip()
+        mock_monotonic.return_value = 131.0
+        self.fail_next = False
+        self.assertEqual(self.query(), "rows")
+        self.assertEqual(self.breaker.state, breaker_module.CLOSED)
+
+    @patch('time.monotonic')
+    def test_half_open_failure_reopens(self, mock_monotonic):
+        """
+        Test a failed trial call reopens the circuit for another cooldown
+        """
+        mock_monotonic.return_value = 100.0
+        self.trip()
+        mock_monotonic.return_value = 131.0
+        with self.assertRaises(sqlite3.OperationalError):
+            self.query()
+        self.assertEqual(self.breaker.state, breaker_module.OPEN)
+        mock_monotonic.return_value = 150.0
+        with self.assertRaises(breaker_module.CircuitOpenError):
+            self.query()
+
+    def test_open_error_not_retried(self):
+        """
+        Test retry_on_failure does not retry CircuitOpenError
+        """
+        self.trip()
+        wrapped = breaker_module.retry_on_failure(retries=3, delay=1)(
+            self.query)
+        with self.assertRaises(breaker_module.CircuitOpenError):
+            wrapped()
+        self.assertEqual(self.breaker.stats()['rejected'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
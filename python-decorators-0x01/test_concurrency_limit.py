@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Test concurrency_limit module
+"""
+import asyncio
+import threading
+import time
+import unittest
+
+limit_module = __import__('8-concurrency_limit')
+
+
+class TestConcurrencyLimiter(unittest.TestCase):
+    """
+    Test lanes, bounded queues and metrics of ConcurrencyLimiter
+    """
+
+    def run_threads(self, func, count):
+        """
+        Run func in count threads, returning the exceptions raised
+        """
+        errors = []
+
+        def worker():
+            try:
+                func()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return errors
+
+    def test_write_lane_serializes(self):
+        """
+        Test at most one writer runs at a time
+        """
+        limiter = limit_module.ConcurrencyLimiter(writers=1, timeout=5)
+        active = []
+        peak = []
+
+        @limiter.write
+        def write():
+            active.append(1)
+            peak.append(len(active))
+            time.sleep(0.01)
+            active.pop()
+
+        self.assertEqual(self.run_threads(write, 5), [])
+        self.assertEqual(max(peak), 1)
+        stats = limiter.stats()['write']
+        self.assertEqual(stats['acquired'], 5)
+        self.assertEqual(stats['in_flight'], 0)
+        self.assertGreater(stats['max_wait'], 0)
+        self.assertGreaterEqual(stats['peak_waiting'], 1)
+
+    def test_lanes_independent(self):
+        """
+        Test a busy write lane does not block readers
+        """
+        limiter = limit_module.ConcurrencyLimiter(writers=1, timeout=0.01)
+        release = threading.Event()
+
+        @limiter.write
+        def write():
+            release.wait()
+
+        @limiter.read
+        def read():
+            return "rows"
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        time.sleep(0.01)
+        self.assertEqual(read(), "rows")
+        with self.assertRaises(limit_module.ConcurrencyLimitError):
+            write()
+        release.set()
+        writer.join()
+        self.assertEqual(limiter.stats()['write']['timeouts'], 1)
+
+    def test_queue_full_rejects(self):
+        """
+        Test callers beyond max_waiting are rejected immediately
+        """
+        limiter = limit_module.ConcurrencyLimiter(writers=1, max_waiting=1,
+                                                  timeout=1)
+        release = threading.Event()
+
+        @limiter.write
+        def write():
+            release.wait()
+
+        threads = [threading.Thread(target=write) for _ in range(2)]
+        for t in threads:
+            t.start()
+        time.sleep(0.02)
+        with self.assertRaises(limit_module.ConcurrencyLimitError):
+            write()
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(limiter.stats()['write']['rejected'], 1)
+
+    def test_async_lane(self):
+        """
+        Test coroutines are limited and time out while waiting
+        """
+        limiter = limit_module.ConcurrencyLimiter(readers=2, timeout=0.05)
+        active = []
+        peak = []
+
+        @limiter.read
+        async def read(delay):
+            active.append(1)
+            peak.append(len(active))
+            await asyncio.sleep(delay)
+            active.pop()
+
+        async def main():
+            await asyncio.gather(*(read(0.01) for _ in range(6)))
+            return await asyncio.gather(
+                read(0.2), read(0.2), read(0), return_exceptions=True)
+
+        outcomes = asyncio.run(main())
+        self.assertEqual(max(peak), 2)
+        self.assertIsInstance(outcomes[2], limit_module.ConcurrencyLimitError)
+        self.assertEqual(limiter.stats()['read']['timeouts'], 1)
+
+    def test_sync_and_async_share_lane(self):
+        """
+        Test threads and coroutines together never exceed writers=1
+        """
+        limiter = limit_module.ConcurrencyLimiter(writers=1, timeout=5)
+        active = []
+        peak = []
+
+        @limiter.write
+        def write():
+            active.append(1)
+            peak.append(len(active))
+            time.sleep(0.01)
+            active.pop()
+
+        @limiter.write
+        async def write_async():
+            active.append(1)
+            peak.append(len(active))
+            await asyncio.sleep(0.01)
+            active.pop()
+
+        async def main():
+            await asyncio.gather(*(write_async() for _ in range(5)))
+
+        threads = [threading.Thread(target=write) for _ in range(5)]
+        threads += [threading.Thread(target=asyncio.run, args=(main(),))
+                    for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(peak), 15)
+        self.assertEqual(max(peak), 1)
+        stats = limiter.stats()['write']
+        self.assertEqual(stats['acquired'], 15)
+        self.assertEqual(stats['in_flight'], 0)
+        self.assertEqual(stats['timeouts'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Test db_operation module
+"""
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+op_module = __import__('7-db_operation')
+log_module = __import__('0-log_queries')
+
+
+class TestDbOperation(unittest.TestCase):
+    """
+    Test the fused decorator matches the stacked decorators
+    """
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+        conn.execute("INSERT INTO users (email) VALUES ('a@example.com')")
+        conn.commit()
+        conn.close()
+        self.calls = 0
+
+    def tearDown(self):
+        op_module._db.close_pools()
+        os.remove(self.db_path)
+
+    def email(self):
+        """
+        Return the committed email of user 1
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute("SELECT email FROM users").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_transactional_commit(self):
+        """
+        Test updates are committed on success and rolled back on failure
+        """
+        @op_module.db_operation(db_name=self.db_path, transactional=True)
+        def update_user_email(conn, new_email, fail=False):
+            conn.execute("UPDATE users SET email = ?", (new_email,))
+            if fail:
+                raise ValueError("boom")
+
+        update_user_email("b@example.com")
+        self.assertEqual(self.email(), "b@example.com")
+        with self.assertRaises(ValueError):
+            update_user_email("c@example.com", fail=True)
+        self.assertEqual(self.email(), "b@example.com")
+
+    @patch('time.sleep')
+    def test_retry_reruns_transaction(self, mock_sleep):
+        """
+        Test a retryable error rolls back and reruns the function
+        """
+        @op_module.db_operation(db_name=self.db_path, pooled=True,
+                                transactional=True, retries=3)
+        def update_user_email(conn, new_email):
+            self.calls += 1
+            conn.execute("UPDATE users SET email = email || 'x'")
+            if self.calls < 3:
+                raise sqlite3.OperationalError("database is locked")
+
+        update_user_email("ignored")
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(self.email(), "a@example.comx")
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    def test_cache_skips_connection(self):
+        """
+        Test a cache hit returns without calling the function
+        """
+        @op_module.db_operation(db_name=self.db_path, cache=True)
+        def fetch(conn, query):
+            self.calls += 1
+            return conn.execute(query).fetchall()
+
+        first = fetch(query="SELECT email FROM users")
+        with patch('sqlite3.connect') as mock_connect:
+            second = fetch("SELECT email FROM users")
+        mock_connect.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertEqual(self.calls, 1)
+
+    def test_cache_keyed_by_params(self):
+        """
+        Test the same query with other params is not served from cache
+        """
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO users (email) VALUES ('b@example.com')")
+        conn.commit()
+        conn.close()
+
+        @op_module.db_operation(db_name=self.db_path, cache=True)
+        def get(conn, query, params):
+            self.calls += 1
+            return conn.execute(query, params).fetchone()
+
+        query = "SELECT email FROM users WHERE id = ?"
+        self.assertEqual(get(query, (1,)), ('a@example.com',))
+        self.assertEqual(get(query, (2,)), ('b@example.com',))
+        self.assertEqual(get(query, [1]), ('a@example.com',))
+        self.assertEqual(self.calls, 2)
+
+    def test_log_records_latency(self):
+        """
+        Test logged calls feed the query log and latency histograms
+        """
+        logger = logging.getLogger('test_db_operation')
+        logger.addHandler(logging.NullHandler())
+        logger.propagate = False
+        queue = log_module.QueryLogQueue(logger=logger, flush_interval=60)
+
+        @op_module.db_operation(db_name=self.db_path, log=True, queue=queue)
+        def fetch(conn, query):
+            return conn.execute(query).fetchall()
+
+        fetch(query="SELECT email FROM users WHERE id = 1")
+        self.assertEqual(queue.metrics['enqueued'], 1)
+        summary = log_module.query_stats.summary(
+            "SELECT email FROM users WHERE id = ?")
+        self.assertGreaterEqual(summary['count'], 1)
+
+    def test_log_record_matches_log_queries(self):
+        """
+        Test records carry the log_queries schema and honour sample_rate
+        """
+        logger = logging.getLogger('test_db_operation.schema')
+        logger.propagate = False
+        queue = log_module.QueryLogQueue(logger=logger, flush_interval=60)
+        self.addCleanup(log_module._plans.clear)
+        records = []
+        original = queue.enqueue
+        queue.enqueue = records.append
+
+        @op_module.db_operation(db_name=self.db_path, log=True, queue=queue,
+                                slow_threshold=60)
+        def fetch(conn, query, params):
+            return conn.execute(query, params).fetchall()
+
+        @log_module.log_queries(queue=queue, slow_threshold=60)
+        def stacked(query, params):
+            return [('a@example.com',)]
+
+        fetch("SELECT email FROM users WHERE id = ?", (1,))
+        stacked("SELECT email FROM users WHERE id = ?", (1,))
+        self.assertEqual(set(records[0]), set(records[1]))
+        self.assertEqual(records[0]['params'], (1,))
+        self.assertEqual(records[0]['row_count'], 1)
+        self.assertIn('test_db_operation.py', records[0]['caller'])
+        self.assertIn('test_log_record_matches_log_queries',
+                      records[0]['caller'])
+
+        @op_module.db_operation(db_name=self.db_path, log=True, queue=queue,
+                                sample_rate=0, slow_threshold=60)
+        def sampled(conn, query):
+            return conn.execute(query).fetchall()
+
+        @op_module.db_operation(db_name=self.db_path, log=True, queue=queue,
+                                sample_rate=0, slow_threshold=0)
+        def slow(conn, query):
+            return conn.execute(query).fetchall()
+
+        sampled("SELECT email FROM users")
+        self.assertEqual(len(records), 2)
+        self.assertEqual(queue.metrics['sampled_out'], 1)
+        slow("SELECT email FROM users ORDER BY email")
+        self.assertTrue(records[2]['slow'])
+        self.assertNotIn('temp_btrees', records[2])
+        queue.enqueue = original
+        original(records[2])
+        with patch.object(queue.logger, 'info') as info:
+            queue.flush()
+        written = json.loads(info.call_args[0][0])
+        self.assertEqual(written['temp_btrees'],
+                         ["USE TEMP B-TREE FOR ORDER BY"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Test db_router module
+"""
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+db_module = __import__('1-with_db_connection')
+router_module = __import__('12-db_router')
+
+
+class TestDatabaseRouter(unittest.TestCase):
+    """
+    Test reads go to replicas and writes to the primary
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.primary = os.path.join(self.tmpdir, 'primary.db')
+        conn = sqlite3.connect(self.primary)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("CREATE TABLE origin (name TEXT)")
+        conn.execute("INSERT INTO users (name) VALUES ('Alice')")
+        conn.execute("INSERT INTO origin VALUES ('primary')")
+        conn.commit()
+        self.replicas = []
+        for i in range(2):
+            path = os.path.join(self.tmpdir, f'replica{i}.db')
+            replica = sqlite3.connect(path)
+            conn.backup(replica)
+            replica.execute("UPDATE origin SET name = ?", (f'replica{i}',))
+            replica.commit()
+            replica.close()
+            self.replicas.append(path)
+        conn.close()
+
+    def tearDown(self):
+        db_module.close_pools()
+        shutil.rmtree(self.tmpdir)
+
+    def make_router(self, **options):
+        """
+        Return a router over the test primary and replicas
+        """
+        return router_module.DatabaseRouter(self.primary, self.replicas,
+                                            **options)
+
+    def test_round_robin_reads(self):
+        """
+        Test reads alternate between replicas
+        """
+        router = self.make_router()
+
+        @router.read
+        def origin(conn):
+            return conn.execute("SELECT name FROM origin").fetchone()[0]
+
+        self.assertEqual([origin() for _ in range(4)],
+                         ['replica0', 'replica1', 'replica0', 'replica1'])
+        self.assertEqual(router.stats()[self.primary]['calls'], 0)
+
+    def test_writes_go_to_primary(self):
+        """
+        Test writes reach the primary and replicas refuse writes
+        """
+        router = self.make_router()
+
+        @router.write
+        def rename(conn, name):
+            conn.execute("UPDATE users SET name = ?", (name,))
+            conn.commit()
+            return conn.execute("SELECT name FROM origin").fetchone()[0]
+
+        @router.read
+        def rename_on_replica(conn, name):
+            conn.execute("UPDATE users SET name = ?", (name,))
+
+        self.assertEqual(rename('Bob'), 'primary')
+        with self.assertRaises(sqlite3.OperationalError):
+            rename_on_replica('Carol')
+
+    def test_least_busy(self):
+        """
+        Test a read goes to the replica with fewer calls in flight
+        """
+        router = self.make_router(strategy='least_busy')
+        entered = threading.Event()
+        release = threading.Event()
+
+        @router.read
+        def slow_origin(conn):
+            entered.set()
+            release.wait()
+
+        @router.read
+        def origin(conn):
+            return conn.execute("SELECT name FROM origin").fetchone()[0]
+
+        thread = threading.Thread(target=slow_origin)
+        thread.start()
+        entered.wait()
+        try:
+            self.assertEqual([origin(), origin()], ['replica1', 'replica1'])
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(router.stats()[self.replicas[0]],
+                         {'calls': 1, 'in_flight': 0})
+
+    def test_with_db_connection_router(self):
+        """
+        Test with_db_connection hands routing to a router
+        """
+        router = self.make_router()
+
+        @db_module.with_db_connection(router=router, mode='write')
+        def origin(conn):
+            return conn.execute("SELECT name FROM origin").fetchone()[0]
+
+        self.assertEqual(origin(), 'primary')
+
+    def test_no_replicas_reads_primary(self):
+        """
+        Test reads use the primary when there are no replicas
+        """
+        router = router_module.DatabaseRouter(self.primary, pooled=True)
+
+        @router.read
+        def origin(conn):
+            return conn.execute("SELECT name FROM origin").fetchone()[0]
+
+        self.assertEqual(origin(), 'primary')
+
+    def test_unknown_strategy(self):
+        """
+        Test an unknown strategy is rejected
+        """
+        with self.assertRaises(ValueError):
+            self.make_router(strategy='random')
+
+    def test_async_read(self):
+        """
+        Test coroutines get an aiosqlite connection to a replica
+        """
+        router = self.make_router()
+
+        @router.read
+        async def origin(conn):
+            async with conn.execute("SELECT name FROM origin") as cursor:
+                return (await cursor.fetchone())[0]
+
+        self.assertEqual(asyncio.run(origin()), 'replica0')
+
+    def test_read_heavy_replica_profile(self):
+        """
+        Test read_heavy applies to read-only replicas without journal_mode
+        """
+        router = self.make_router(replica_profile='read_heavy')
+
+        @router.read
+        def settings(conn):
+            return (conn.execute("PRAGMA cache_size").fetchone()[0],
+                    conn.execute("PRAGMA journal_mode").fetchone()[0])
+
+        @router.read
+        async def origin(conn):
+            async with conn.execute("SELECT name FROM origin") as cursor:
+                return (await cursor.fetchone())[0]
+
+        self.assertEqual(settings(), (-65536, 'delete'))
+        self.assertEqual(asyncio.run(origin()), 'replica1')
+        pooled = self.make_router(replica_profile='read_heavy', pooled=True)
+        self.assertEqual(pooled.read(settings.__wrapped__)(),
+                         (-65536, 'delete'))
+
+    def test_failed_profile_closes_connection(self):
+        """
+        Test a profile that fails to apply leaves no connection open
+        """
+        router = self.make_router(replica_profile={'cache_size': '-'})
+        opened = []
+
+        def spy(apply):
+            def recording(conn, profile):
+                opened.append(conn)
+                return apply(conn, profile)
+            return recording
+
+        @router.read
+        def origin(conn):
+            return None
+
+        @router.read
+        async def async_origin(conn):
+            return None
+
+        async def closed(conn):
+            with self.assertRaises(ValueError):
+                await conn.execute("SELECT 1")
+
+        with mock.patch.object(db_module, 'apply_profile',
+                               spy(db_module.apply_profile)), \
+                mock.patch.object(db_module, 'apply_profile_async',
+                                  spy(db_module.apply_profile_async)):
+            with self.assertRaises(sqlite3.Error):
+                origin()
+            with self.assertRaises(sqlite3.Error):
+                asyncio.run(async_origin())
+        with self.assertRaises(sqlite3.ProgrammingError):
+            opened[0].execute("SELECT 1")
+        asyncio.run(closed(opened[1]))
+        self.assertEqual(router.stats()[self.replicas[0]]['in_flight'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test deadline module
+"""
+import asyncio
+import sqlite3
+import time
+import unittest
+
+deadline_module = __import__('9-deadline')
+
+RUNAWAY_QUERY = ("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 "
+                 "FROM c) SELECT count(*) FROM c")
+
+
+class TestWithDeadline(unittest.TestCase):
+    """
+    Test deadlines interrupt queries and propagate to nested calls
+    """
+
+    def test_runaway_query_interrupted(self):
+        """
+        Test a query still running at the deadline is interrupted
+        """
+        @deadline_module.with_deadline(0.05)
+        def runaway(conn):
+            return conn.execute(RUNAWAY_QUERY).fetchone()
+
+        conn = sqlite3.connect(":memory:")
+        start = time.monotonic()
+        with self.assertRaises(deadline_module.DeadlineExceeded):
+            runaway(conn)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(conn.execute("SELECT 1").fetchone(), (1,))
+        conn.close()
+
+    def test_nested_calls_share_budget(self):
+        """
+        Test inner calls inherit the outer deadline and cannot extend it
+        """
+        seen = []
+
+        @deadline_module.with_deadline(10)
+        def inner(conn):
+            seen.append(deadline_module.remaining())
+            return conn.execute(RUNAWAY_QUERY).fetchone()
+
+        @deadline_module.with_deadline(0.05)
+        def outer(conn):
+            return inner(conn)
+
+        conn = sqlite3.connect(":memory:")
+        with self.assertRaises(deadline_module.DeadlineExceeded):
+            outer(conn)
+        conn.close()
+        self.assertLess(seen[0], 0.05)
+        self.assertIsNone(deadline_module.remaining())
+
+    def test_expired_before_call(self):
+        """
+        Test a call with no time left is not started
+        """
+        calls = []
+
+        @deadline_module.with_deadline()
+        def inner():
+            calls.append(1)
+
+        @deadline_module.with_deadline(0.01)
+        def outer():
+            time.sleep(0.02)
+            inner()
+
+        with self.assertRaises(deadline_module.DeadlineExceeded):
+            outer()
+        self.assertEqual(calls, [])
+
+    def test_handler_removed_after_call(self):
+        """
+        Test the connection runs without a deadline after the call returns
+        """
+        @deadline_module.with_deadline(0.05)
+        def quick(conn):
+            return conn.execute("SELECT 1").fetchone()
+
+        conn = sqlite3.connect(":memory:")
+        quick(conn)
+        time.sleep(0.06)
+        self.assertEqual(conn.execute(
+            "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c "
+            "WHERE x < 100000) SELECT count(*) FROM c").fetchone(), (100000,))
+        conn.close()
+
+    def test_async_query_interrupted(self):
+        """
+        Test an aiosqlite query is interrupted at the deadline
+        """
+        import aiosqlite
+
+        @deadline_module.with_deadline(0.05)
+        async def runaway(conn):
+            async with conn.execute(RUNAWAY_QUERY) as cursor:
+                return await cursor.fetchone()
+
+        async def main():
+            async with aiosqlite.connect(":memory:") as conn:
+                with self.assertRaises(deadline_module.DeadlineExceeded):
+                    await runaway(conn)
+                async with conn.execute("SELECT 1") as cursor:
+                    return await cursor.fetchone()
+
+        self.assertEqual(asyncio.run(main()), (1,))
+
+    def test_async_inner_timeout_not_converted(self):
+        """
+        Test a TimeoutError raised by the call itself propagates unchanged
+        """
+        import aiosqlite
+        limit_module = __import__('8-concurrency_limit')
+
+        @deadline_module.with_deadline(10)
+        async def limited(conn):
+            raise limit_module.ConcurrencyLimitError("write queue full")
+
+        async def main():
+            async with aiosqlite.connect(":memory:") as conn:
+                with self.assertRaises(
+                        limit_module.ConcurrencyLimitError) as caught:
+                    await limited(conn)
+                async with conn.execute("SELECT 1") as cursor:
+                    return caught.exception, await cursor.fetchone()
+
+        error, row = asyncio.run(main())
+        self.assertNotIsInstance(error, deadline_module.DeadlineExceeded)
+        self.assertEqual(row, (1,))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Test log_queries module
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+log_module = __import__('0-log_queries')
+
+
+class ListHandler(logging.Handler):
+    """
+    Logging handler collecting messages, optionally slowly
+    """
+
+    def __init__(self, delay=0):
+        super().__init__()
+        self.delay = delay
+        self.messages = []
+
+    def emit(self, record):
+        time.sleep(self.delay)
+        self.messages.append(record.getMessage())
+
+
+class QueryLogTestCase(unittest.TestCase):
+    """
+    Base class providing query log queues backed by a ListHandler
+    """
+
+    def make_queue(self, delay=0, **options):
+        """
+        Return a QueryLogQueue writing to a fresh ListHandler
+        """
+        logger = logging.getLogger(f"test_query_log.{id(self)}.{delay}")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        self.handler = ListHandler(delay)
+        logger.handlers = [self.handler]
+        return log_module.QueryLogQueue(logger=logger, **options)
+
+
+class TestLogQueries(QueryLogTestCase):
+    """
+    Test structured, non-blocking query logging
+    """
+
+    def test_structured_record(self):
+        """
+        Test a record carries query, params, duration, row count and caller
+        """
+        queue = self.make_queue(flush_interval=60)
+
+        @log_module.log_queries(queue=queue)
+        def fetch(query, params=None):
+            return [(1,), (2,)]
+
+        fetch("SELECT id FROM users WHERE age > ?", (30,))
+        queue.flush()
+        record = json.loads(self.handler.messages[0])
+        self.assertEqual(record['query'], "SELECT id FROM users WHERE age > ?")
+        self.assertEqual(record['params'], [30])
+        self.assertEqual(record['row_count'], 2)
+        self.assertGreaterEqual(record['duration_ms'], 0)
+        self.assertIn("test_structured_record", record['caller'])
+
+    def test_failed_call_recorded(self):
+        """
+        Test a call that raises is still logged and timed, with its error
+        """
+        queue = self.make_queue(flush_interval=60)
+        stats = log_module.QueryStats()
+
+        @log_module.log_queries(queue=queue, stats=stats, sample_rate=0,
+                                explain=False)
+        def fetch(query):
+            raise sqlite3.OperationalError("no such table: users")
+
+        @log_module.log_queries(queue=queue, stats=stats, sample_rate=0,
+                                explain=False)
+        async def afetch(query):
+            raise sqlite3.OperationalError("no such table: users")
+
+        with self.assertRaises(sqlite3.OperationalError):
+            fetch("SELECT * FROM users")
+        with self.assertRaises(sqlite3.OperationalError):
+            asyncio.run(afetch("SELECT * FROM users"))
+        queue.flush()
+        records = [json.loads(m) for m in self.handler.messages]
+        self.assertEqual([r['error'] for r in records],
+                         ["OperationalError: no such table: users"] * 2)
+        self.assertEqual([r['row_count'] for r in records], [None, None])
+        self.assertIn("test_failed_call_recorded", records[0]['caller'])
+        self.assertEqual(stats.summary("SELECT * FROM users")['count'], 2)
+
+    def test_slow_handler_does_not_block(self):
+        """
+        Test queries return without waiting for a slow log handler
+        """
+        queue = self.make_queue(delay=0.05, flush_interval=0.001)
+
+        @log_module.log_queries(queue=queue)
+        def fetch(query):
+            return []
+
+        start = time.perf_counter()
+        for _ in range(20):
+            fetch(query="SELECT 1")
+        self.assertLess(time.perf_counter() - start, 0.05)
+
+    def test_drop_oldest(self):
+        """
+        Test a full buffer drops its oldest record
+        """
+        queue = self.make_queue(maxlen=2, flush_interval=60)
+        for i in range(3):
+            queue.enqueue({'query': str(i)})
+        queue.flush()
+        self.assertEqual([json.loads(m)['query'] for m in self.handler.messages],
+                         ["1", "2"])
+        self.assertEqual(queue.metrics['dropped'], 1)
+
+    def test_drop_newest(self):
+        """
+        Test drop_newest keeps the buffered records
+        """
+        queue = self.make_queue(maxlen=2, flush_interval=60,
+                                overflow='drop_newest')
+        for i in range(3):
+            queue.enqueue({'query': str(i)})
+        queue.flush()
+        self.assertEqual([json.loads(m)['query'] for m in self.handler.messages],
+                         ["0", "1"])
+
+    def test_sampling(self):
+        """
+        Test sample_rate=0 records nothing but still runs the query
+        """
+        queue = self.make_queue(flush_interval=60)
+
+        @log_module.log_queries(queue=queue, sample_rate=0)
+        def fetch(query):
+            return "rows"
+
+        self.assertEqual(fetch("SELECT 1"), "rows")
+        self.assertEqual(queue.metrics['enqueued'], 0)
+        self.assertEqual(queue.metrics['sampled_out'], 1)
+
+
+class TestQueryLatency(QueryLogTestCase):
+    """
+    Test latency histograms and the slow-query log
+    """
+
+    def setUp(self):
+        self.stats = log_module.QueryStats()
+        self.queue = self.make_queue(flush_interval=60)
+
+    def test_normalize_query(self):
+        """
+        Test literals and IN lists collapse to one shape
+        """
+        self.assertEqual(
+            log_module.normalize_query(
+                "SELECT * FROM users\n WHERE id IN (1, 2, 3) AND name = 'Bob'"),
+            "SELECT * FROM users WHERE id IN (?...) AND name = ?")
+
+    def test_histogram_percentiles(self):
+        """
+        Test percentiles fall within the histogram's bucket precision
+        """
+        histogram = log_module.LatencyHistogram()
+        for ms in range(1, 101):
+            histogram.record(ms / 1000)
+        summary = histogram.summary()
+        self.assertEqual(summary['count'], 100)
+        self.assertAlmostEqual(summary['total_ms'], 5050, places=6)
+        self.assertAlmostEqual(summary['p50_ms'], 50, delta=5)
+        self.assertAlmostEqual(summary['p95_ms'], 95, delta=9.5)
+        self.assertAlmostEqual(summary['p99_ms'], 99, delta=9.9)
+        self.assertAlmostEqual(summary['max_ms'], 100)
+
+    def test_slow_query_record(self):
+        """
+        Test calls over the threshold are logged even when sampled out
+        """
+        self.addCleanup(log_module._plans.clear)
+
+        @log_module.log_queries(queue=self.queue, stats=self.stats,
+                                slow_threshold=0.01, sample_rate=0,
+                                explain=False)
+        def fetch(query, delay):
+            time.sleep(delay)
+            return []
+
+        fetch("SELECT * FROM users WHERE id = 1", 0)
+        fetch("SELECT * FROM users WHERE id = 2", 0.02)
+        self.queue.flush()
+        self.assertEqual(len(self.handler.messages), 1)
+        record = json.loads(self.handler.messages[0])
+        self.assertTrue(record['slow'])
+        self.assertEqual(record['shape'], "SELECT * FROM users WHERE id = ?")
+        self.assertEqual(
+            self.stats.summary("SELECT * FROM users WHERE id = ?")['count'], 2)
+
+    def test_top_queries(self):
+        """
+        Test the most expensive shapes come first
+        """
+        for _ in range(3):
+            self.stats.record("SELECT a", 0.001)
+        self.stats.record("SELECT b", 0.01)
+        self.stats.record("SELECT c", 0.0001)
+        top = self.stats.top(2)
+        self.assertEqual([row['shape'] for row in top], ["SELECT b", "SELECT a"])
+        self.assertEqual(self.stats.top(1, by='count')[0]['shape'], "SELECT a")
+
+
+class TestQueryPlans(QueryLogTestCase):
+    """
+    Test EXPLAIN QUERY PLAN capture for slow queries
+    """
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                     "name TEXT, age INTEGER)")
+        conn.commit()
+        conn.close()
+        self.connects = 0
+        self.queue = self.make_queue(flush_interval=60)
+        log_module._plans.clear()
+
+    def tearDown(self):
+        log_module._plans.clear()
+        os.remove(self.db_path)
+
+    def connect(self):
+        """
+        Open the test database, counting connections
+        """
+        self.connects += 1
+        return sqlite3.connect(self.db_path)
+
+    def test_explain_flags(self):
+        """
+        Test full-table scans and temp B-tree sorts are flagged
+        """
+        conn = self.connect()
+        scan = log_module.explain_query(
+            conn, "SELECT * FROM users WHERE age > ? ORDER BY name", (40,))
+        lookup = log_module.explain_query(
+            conn, "SELECT * FROM users WHERE id = ?", (1,))
+        conn.close()
+        self.assertEqual(len(scan['full_scans']), 1)
+        self.assertEqual(len(scan['temp_btrees']), 1)
+        self.assertEqual(lookup['full_scans'], [])
+        self.assertEqual(lookup['temp_btrees'], [])
+
+    def test_slow_record_has_plan_once_per_shape(self):
+        """
+        Test the plan is attached to slow records and explained only once
+        """
+        @log_module.log_queries(queue=self.queue, slow_threshold=0,
+                                connect=self.connect,
+                                stats=log_module.QueryStats())
+        def fetch(query):
+            return []
+
+        fetch("SELECT * FROM users WHERE age > 30")
+        fetch("SELECT * FROM users WHERE age > 40")
+        self.assertEqual(self.connects, 0)
+        self.queue.flush()
+        records = [json.loads(m) for m in self.handler.messages]
+        self.assertEqual(self.connects, 1)
+        for record in records:
+            self.assertEqual(record['full_scans'], ["SCAN users"])
+
+    def test_plan_captured_on_drain_thread(self):
+        """
+        Test the plan is explained by the queue's thread, not the caller's
+        """
+        threads = []
+
+        def connect():
+            threads.append(threading.current_thread())
+            return self.connect()
+
+        queue = self.make_queue(flush_interval=0.01)
+
+        @log_module.log_queries(queue=queue, slow_threshold=0,
+                                connect=connect,
+                                stats=log_module.QueryStats())
+        def fetch(query):
+            return []
+
+        fetch("SELECT * FROM users WHERE age > 30")
+        deadline = time.time() + 5
+        while not self.handler.messages and time.time() < deadline:
+            time.sleep(0.01)
+        record = json.loads(self.handler.messages[0])
+        self.assertEqual(record['full_scans'], ["SCAN users"])
+        self.assertNotIn('_explain', record)
+        self.assertEqual([t.name for t in threads], ['query-log'])
+
+    def test_default_connect_is_read_only(self):
+        """
+        Test the default plan connection never creates users.db
+        """
+        cwd = os.getcwd()
+        directory = tempfile.mkdtemp()
+        os.chdir(directory)
+        try:
+            plan = log_module.capture_plan(
+                "SELECT 1 FROM users", "SELECT 1 FROM users")
+            self.assertIn('error', plan)
+            self.assertEqual(os.listdir(directory), [])
+        finally:
+            os.chdir(cwd)
+            os.rmdir(directory)
+
+    def test_unexplainable_query(self):
+        """
+        Test a plan error is recorded instead of raised
+        """
+        plan = log_module.capture_plan("BOGUS", "BOGUS", connect=self.connect)
+        self.assertIn('error', plan)
+
+    def test_cache_query_reports_slow_miss(self):
+        """
+        Test cache_query reports a slow miss, explained when drained
+        """
+        cache_module = __import__('4-cache_query')
+        cache_module.query_cache.clear()
+        original = log_module.query_log
+        log_module.query_log = self.queue
+        conn = self.connect()
+        try:
+            @cache_module.cache_query(slow_threshold=0, connect=self.connect)
+            def fetch(conn, query):
+                return conn.execute(query).fetchall()
+
+            fetch(conn, query="SELECT name FROM users ORDER BY name")
+            fetch(conn, query="SELECT name FROM users ORDER BY name")
+        finally:
+            log_module.query_log = original
+            conn.close()
+            cache_module.query_cache.clear()
+        self.assertEqual(self.connects, 1)
+        self.queue.flush()
+        self.assertEqual(len(self.handler.messages), 1)
+        record = json.loads(self.handler.messages[0])
+        self.assertTrue(record['slow'])
+        self.assertEqual(len(record['temp_btrees']), 1)
+        self.assertEqual(self.connects, 2)
+
+    def test_cache_query_explains_read_only(self):
+        """
+        Test cache_query's default connect is not used to explain plans
+        """
+        cache_module = __import__('4-cache_query')
+        original = log_module.query_log
+        log_module.query_log = self.queue
+        try:
+            cache_module._check_slow("SELECT 1", 1.0,
+                                     cache_module._default_connect, 0)
+        finally:
+            log_module.query_log = original
+        record = self.queue._buffer[0]
+        self.assertIs(record['_explain'][-1], log_module._default_connect)
+
+
+if __name__ == '__main__':
+    unittest.main()
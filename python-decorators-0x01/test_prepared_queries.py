@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test prepared_queries module
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+db_module = __import__('1-with_db_connection')
+prepared_module = __import__('10-prepared_queries')
+
+
+class TestPreparedQueries(unittest.TestCase):
+    """
+    Test the query registry and pooled statement cache metrics
+    """
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.executemany("INSERT INTO users (name) VALUES (?)",
+                         [("Alice",), ("Bob",)])
+        conn.commit()
+        conn.close()
+        self.registry = prepared_module.QueryRegistry()
+
+    def tearDown(self):
+        db_module.close_pools()
+        os.remove(self.db_path)
+
+    def test_query_passed_and_registered(self):
+        """
+        Test the declared SQL is registered and handed to the function
+        """
+        @prepared_module.prepared_query("SELECT name FROM users WHERE id = ?",
+                                        name='user_name',
+                                        registry=self.registry)
+        @db_module.with_db_connection(db_name=self.db_path, pooled=True)
+        def user_name(conn, user_id, query):
+            return conn.execute(query, (user_id,)).fetchone()
+
+        self.assertEqual(user_name(2), ("Bob",))
+        self.assertEqual(self.registry['user_name'],
+                         "SELECT name FROM users WHERE id = ?")
+
+    def test_conflicting_registration(self):
+        """
+        Test a name cannot be bound to two different statements
+        """
+        self.registry.register('q', "SELECT 1")
+        self.registry.register('q', "SELECT 1")
+        with self.assertRaises(ValueError):
+            self.registry.register('q', "SELECT 2")
+
+    def test_pooled_statement_hits(self):
+        """
+        Test a pooled connection reuses the compiled statement
+        """
+        @prepared_module.prepared_query("SELECT name FROM users WHERE id = ?",
+                                        registry=self.registry)
+        @db_module.with_db_connection(db_name=self.db_path, pooled=True)
+        def user_name(conn, user_id, query):
+            cursor = conn.cursor()
+            cursor.execute(query, (user_id,))
+            return cursor.fetchone()
+
+        for user_id in (1, 2, 1, 2):
+            user_name(user_id)
+        stats = db_module.get_pool(self.db_path).statement_stats()
+        self.assertEqual(stats['connections'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 3)
+        self.assertEqual(stats['hit_rate'], 0.75)
+
+    def test_small_cache_evicts(self):
+        """
+        Test statements beyond cached_statements are evicted and recompiled
+        """
+        pool = db_module.ConnectionPool(self.db_path, cached_statements=1)
+        with pool.connection() as conn:
+            for sql in ("SELECT 1", "SELECT 2", "SELECT 1"):
+                conn.execute(sql)
+            stats = conn.statement_cache.stats()
+        pool.close()
+        self.assertEqual(stats['hits'], 0)
+        self.assertEqual(stats['misses'], 3)
+        self.assertEqual(stats['evictions'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test profile_sampling module
+"""
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+profile_module = __import__('11-profile_sampling')
+
+
+def busy(seconds):
+    """
+    Spin on the CPU for the given number of seconds
+    """
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestProfileSampled(unittest.TestCase):
+    """
+    Test sampled stack profiling and collapsed-stack export
+    """
+
+    def setUp(self):
+        self.sampler = profile_module.StackSampler(interval=0.001)
+
+    def test_sampled_call_stacks(self):
+        """
+        Test stacks are rooted at the function and include its callees
+        """
+        @profile_module.profile_sampled(sample_rate=1, sampler=self.sampler)
+        def work():
+            busy(0.05)
+
+        work()
+        name = "TestProfileSampled.test_sampled_call_stacks.<locals>.work"
+        stats = self.sampler.stats()[name]
+        self.assertEqual(stats['calls'], 1)
+        self.assertEqual(stats['sampled'], 1)
+        self.assertGreater(stats['samples'], 5)
+        for line in self.sampler.collapsed().splitlines():
+            stack, count = line.rsplit(" ", 1)
+            self.assertTrue(stack.startswith(name + ";work ("))
+            self.assertIn(";busy (test_profile_sampling.py:", stack)
+            self.assertGreater(int(count), 0)
+
+    def test_unsampled_calls_not_profiled(self):
+        """
+        Test sample_rate=0 counts calls without collecting stacks
+        """
+        @profile_module.profile_sampled(sample_rate=0, sampler=self.sampler)
+        def work():
+            busy(0.01)
+
+        work()
+        work()
+        stats = self.sampler.stats()
+        self.assertEqual([s['calls'] for s in stats.values()], [2])
+        self.assertEqual([s['sampled'] for s in stats.values()], [0])
+        self.assertEqual(self.sampler.collapsed(), "")
+
+    def test_write_collapsed(self):
+        """
+        Test the collapsed file holds one line per stack
+        """
+        @profile_module.profile_sampled(sample_rate=1, sampler=self.sampler)
+        def work():
+            busy(0.02)
+
+        work()
+        fd, path = tempfile.mkstemp(suffix='.folded')
+        os.close(fd)
+        try:
+            self.sampler.write_collapsed(path)
+            with open(path) as f:
+                self.assertEqual(f.read(), self.sampler.collapsed())
+        finally:
+            os.remove(path)
+
+    def test_coroutine_skips_awaits(self):
+        """
+        Test a coroutine is sampled while running but not while suspended
+        """
+        @profile_module.profile_sampled(sample_rate=1, sampler=self.sampler)
+        async def work():
+            busy(0.03)
+            await asyncio.sleep(0.05)
+
+        asyncio.run(work())
+        stacks = self.sampler.collapsed()
+        self.assertIn(";busy (", stacks)
+        self.assertNotIn("sleep", stacks)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test retry_on_failure module
+"""
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+retry_module = __import__('3-retry_on_failure')
+
+
+class TestRetryOnFailure(unittest.TestCase):
+    """
+    Test backoff, classification and budget of retry_on_failure
+    """
+
+    def setUp(self):
+        for key in retry_module.retry_metrics:
+            retry_module.retry_metrics[key] = 0
+
+    def flaky(self, errors, result="rows"):
+        """
+        Return a function raising each of errors in turn, then returning result
+        """
+        errors = list(errors)
+        calls = []
+
+        def func():
+            calls.append(1)
+            if errors:
+                raise errors.pop(0)
+            return result
+        func.calls = calls
+        return func
+
+    @patch('time.sleep')
+    def test_retries_locked_database(self, mock_sleep):
+        """
+        Test a locked database is retried until it succeeds
+        """
+        func = self.flaky([sqlite3.OperationalError("database is locked")] * 2)
+        wrapped = retry_module.retry_on_failure(retries=3, delay=1,
+                                                budget=None)(func)
+        self.assertEqual(wrapped(), "rows")
+        self.assertEqual(len(func.calls), 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        metrics = retry_module.get_retry_metrics()
+        self.assertEqual(metrics['attempts'], 3)
+        self.assertEqual(metrics['retries'], 2)
+
+    @patch('time.sleep')
+    def test_syntax_error_not_retried(self, mock_sleep):
+        """
+        Test a syntax error is raised immediately
+        """
+        func = self.flaky([sqlite3.OperationalError('near "SELEC": syntax error')])
+        wrapped = retry_module.retry_on_failure(budget=None)(func)
+        with self.assertRaises(sqlite3.OperationalError):
+            wrapped()
+        self.assertEqual(len(func.calls), 1)
+        mock_sleep.assert_not_called()
+        self.assertEqual(retry_module.get_retry_metrics()['not_retryable'], 1)
+
+    @patch('time.sleep')
+    def test_give_up(self, mock_sleep):
+        """
+        Test the last error is raised once retries are used up
+        """
+        func = self.flaky([sqlite3.OperationalError("database is locked")] * 5)
+        wrapped = retry_module.retry_on_failure(retries=3, budget=None)(func)
+        with self.assertRaises(sqlite3.OperationalError):
+            wrapped()
+        self.assertEqual(len(func.calls), 3)
+        self.assertEqual(retry_module.get_retry_metrics()['give_ups'], 1)
+
+    def test_backoff_delay(self):
+        """
+        Test delays grow exponentially, are capped and jittered below the cap
+        """
+        delays = [retry_module.backoff_delay(n, 1, 5, jitter=False)
+                  for n in range(5)]
+        self.assertEqual(delays, [1, 2, 4, 5, 5])
+        for _ in range(100):
+            self.assertTrue(0 <= retry_module.backoff_delay(3, 1, 5) <= 5)
+
+    @patch('time.sleep')
+    def test_budget_caps_retries(self, mock_sleep):
+        """
+        Test retries stop once the budget is spent
+        """
+        budget = retry_module.RetryBudget(ratio=0.1, max_tokens=2)
+        locked = sqlite3.OperationalError("database is locked")
+        wrapped = retry_module.retry_on_failure(retries=3, budget=budget)(
+            self.flaky([locked] * 100))
+        for _ in range(5):
+            with self.assertRaises(sqlite3.OperationalError):
+                wrapped()
+        metrics = retry_module.get_retry_metrics()
+        self.assertEqual(metrics['retries'], 2)
+        self.assertEqual(metrics['budget_exhausted'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test transactional module
+"""
+import functools
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+tx_module = __import__('2-transactional')
+
+
+class TestGroupCommit(unittest.TestCase):
+    """
+    Test the group-commit mode of transactional
+    """
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                     "email TEXT UNIQUE)")
+        conn.executemany("INSERT INTO users (id, email) VALUES (?, ?)",
+                         [(i, f"user{i}@example.com") for i in range(20)])
+        conn.commit()
+        conn.close()
+        self.statements = []
+
+    def tearDown(self):
+        os.remove(self.db_path)
+
+    def with_traced_connection(self, func):
+        """
+        Connection decorator recording every statement sent to SQLite
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.set_trace_callback(self.statements.append)
+            try:
+                return func(conn, *args, **kwargs)
+            finally:
+                conn.close()
+        return wrapper
+
+    def emails(self):
+        """
+        Return the committed emails keyed by user id
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return dict(conn.execute("SELECT id, email FROM users"))
+        finally:
+            conn.close()
+
+    def run_concurrently(self, func, calls):
+        """
+        Run func(*call) for each call in its own thread, collecting outcomes
+        """
+        outcomes = [None] * len(calls)
+        barrier = threading.Barrier(len(calls))
+
+        def worker(i):
+            barrier.wait()
+            try:
+                outcomes[i] = func(*calls[i])
+            except Exception as e:
+                outcomes[i] = e
+
+        threads = [threading.Thread(target=worker, args=(i,))
+                   for i in range(len(calls))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return outcomes
+
+    def test_burst_shares_commits(self):
+        """
+        Test a burst of updates is committed in fewer transactions
+        """
+        @self.with_traced_connection
+        @tx_module.transactional(group_commit=True, window=0.05)
+        def update_user_email(conn, user_id, new_email):
+            conn.execute("UPDATE users SET email = ? WHERE id = ?",
+                         (new_email, user_id))
+            return user_id
+
+        calls = [(i, f"new{i}@example.com") for i in range(20)]
+        outcomes = self.run_concurrently(update_user_email, calls)
+
+        self.assertEqual(outcomes, list(range(20)))
+        self.assertEqual(self.emails(), {i: f"new{i}@example.com"
+                                         for i in range(20)})
+        self.assertLess(self.statements.count("COMMIT"), 20)
+
+    def test_failure_isolated(self):
+        """
+        Test a failing call is rolled back alone and raises only for its caller
+        """
+        @self.with_traced_connection
+        @tx_module.transactional(group_commit=True, window=0.05)
+        def update_user_email(conn, user_id, new_email):
+            conn.execute("UPDATE users SET email = ? WHERE id = ?",
+                         (new_email, user_id))
+
+        calls = [(1, "a@example.com"), (2, "user3@example.com"),
+                 (4, "b@example.com")]
+        outcomes = self.run_concurrently(update_user_email, calls)
+
+        self.assertIsNone(outcomes[0])
+        self.assertIsInstance(outcomes[1], sqlite3.IntegrityError)
+        self.assertIsNone(outcomes[2])
+        emails = self.emails()
+        self.assertEqual(emails[1], "a@example.com")
+        self.assertEqual(emails[2], "user2@example.com")
+        self.assertEqual(emails[4], "b@example.com")
+
+    def test_max_batch(self):
+        """
+        Test batches are capped at max_batch calls
+        """
+        @self.with_traced_connection
+        @tx_module.transactional(group_commit=True, window=1, max_batch=5)
+        def update_user_email(conn, user_id, new_email):
+            conn.execute("UPDATE users SET email = ? WHERE id = ?",
+                         (new_email, user_id))
+
+        calls = [(i, f"new{i}@example.com") for i in range(10)]
+        self.run_concurrently(update_user_email, calls)
+        self.assertEqual(self.statements.count("COMMIT"), 2)
+
+    def test_default_commits_per_call(self):
+        """
+        Test the default mode still commits every call
+        """
+        @self.with_traced_connection
+        @tx_module.transactional
+        def update_user_email(conn, user_id, new_email):
+            conn.execute("UPDATE users SET email = ? WHERE id = ?",
+                         (new_email, user_id))
+
+        update_user_email(1, "a@example.com")
+        update_user_email(2, "b@example.com")
+        self.assertEqual(self.statements.count("COMMIT"), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Test with_db_connection module
+"""
+import inspect
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+db_module = __import__('1-with_db_connection')
+
+
+class TestConnectionPool(unittest.TestCase):
+    """
+    Test ConnectionPool and the pooled with_db_connection mode
+    """
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("INSERT INTO users (name) VALUES ('Alice')")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        db_module.close_pools()
+        os.remove(self.db_path)
+
+    def test_pooled_reuses_connection(self):
+        """
+        Test consecutive pooled calls share one connection
+        """
+        seen = []
+
+        @db_module.with_db_connection(db_name=self.db_path, pooled=True)
+        def get_user(conn, user_id):
+            seen.append(conn)
+            return conn.execute("SELECT name FROM users WHERE id = ?",
+                                (user_id,)).fetchone()
+
+        self.assertEqual(get_user(1), ("Alice",))
+        self.assertEqual(get_user(user_id=1), ("Alice",))
+        self.assertIs(seen[0], seen[1])
+
+    def test_unpooled_default(self):
+        """
+        Test the default mode still opens a fresh connection per call
+        """
+        seen = []
+
+        @db_module.with_db_connection(db_name=self.db_path)
+        def get_user(conn, user_id):
+            seen.append(conn)
+            return conn.execute("SELECT name FROM users WHERE id = ?",
+                                (user_id,)).fetchone()
+
+        get_user(1)
+        get_user(1)
+        self.assertIsNot(seen[0], seen[1])
+
+    def test_rollback_on_return(self):
+        """
+        Test an uncommitted write is rolled back when the connection returns
+        """
+        pool = db_module.ConnectionPool(self.db_path, size=1)
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO users (name) VALUES ('Bob')")
+        with pool.connection() as conn:
+            self.assertFalse(conn.in_transaction)
+            count = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        self.assertEqual(count, 1)
+        pool.close()
+
+    def test_max_lifetime(self):
+        """
+        Test connections older than max_lifetime are replaced
+        """
+        pool = db_module.ConnectionPool(self.db_path, max_lifetime=0.01)
+        with pool.connection() as first:
+            pass
+        time.sleep(0.02)
+        with pool.connection() as second:
+            pass
+        self.assertIsNot(first, second)
+        pool.close()
+
+    def test_broken_connection_replaced(self):
+        """
+        Test a connection failing validation is discarded on checkout
+        """
+        pool = db_module.ConnectionPool(self.db_path)
+        with pool.connection() as first:
+            pass
+        first.close()
+        with pool.connection() as second:
+            self.assertEqual(second.execute("SELECT 1").fetchone(), (1,))
+        self.assertIsNot(first, second)
+        pool.close()
+
+    def test_exhausted_pool_times_out(self):
+        """
+        Test checkout waits at most timeout when every connection is in use
+        """
+        pool = db_module.ConnectionPool(self.db_path, size=1, timeout=0.01)
+        with pool.connection():
+            with self.assertRaises(TimeoutError):
+                pool.acquire()
+        pool.close()
+
+    def test_pools_keyed_by_options(self):
+        """
+        Test get_pool shares a pool only between identical options
+        """
+        default = db_module.get_pool(self.db_path)
+        self.assertIs(db_module.get_pool(self.db_path, profile=None,
+                                         size=5), default)
+        small = db_module.get_pool(self.db_path, size=1)
+        tuned = db_module.get_pool(self.db_path, profile={'cache_size': -100})
+        self.assertIsNot(small, default)
+        self.assertIsNot(tuned, default)
+        self.assertEqual(small.size, 1)
+        self.assertIs(db_module.get_pool(self.db_path,
+                                         profile={'cache_size': -100}), tuned)
+        with tuned.connection() as conn:
+            self.assertEqual(
+                conn.execute("PRAGMA cache_size").fetchone(), (-100,))
+        db_module.close_pools()
+        self.assertIsNot(db_module.get_pool(self.db_path), default)
+
+    def test_pool_lookup_binds_once(self):
+        """
+        Test repeated pooled calls do not re-inspect the pool options
+        """
+        @db_module.with_db_connection(db_name=self.db_path, pooled=True,
+                                      profile='read_heavy')
+        def get_user(conn, user_id):
+            return conn.execute("SELECT name FROM users WHERE id = ?",
+                                (user_id,)).fetchone()
+
+        with mock.patch.object(inspect, 'signature',
+                               wraps=inspect.signature) as signature:
+            for _ in range(3):
+                self.assertEqual(get_user(1), ("Alice",))
+        self.assertEqual(signature.call_count, 1)
+
+
+class TestProfiles(unittest.TestCase):
+    """
+    Test connection profiles applied by with_db_connection
+    """
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+
+    def tearDown(self):
+        db_module.close_pools()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.db_path + suffix):
+                os.remove(self.db_path + suffix)
+
+    def pragmas(self, conn):
+        """
+        Return the pragmas set by the profiles as currently configured
+        """
+        return {name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+                for name in ('journal_mode', 'synchronous', 'cache_size',
+                             'temp_store', 'busy_timeout')}
+
+    def test_read_heavy(self):
+        """
+        Test read_heavy enables WAL and its cache settings
+        """
+        @db_module.with_db_connection(db_name=self.db_path,
+                                      profile='read_heavy')
+        def settings(conn):
+            return self.pragmas(conn)
+
+        self.assertEqual(settings(), {
+            'journal_mode': 'wal',
+            'synchronous': 1,
+            'cache_size': -65536,
+            'temp_store': 2,
+            'busy_timeout': 5000,
+        })
+
+    def test_pooled_profile(self):
+        """
+        Test pooled connections are opened with the profile
+        """
+        @db_module.with_db_connection(db_name=self.db_path, pooled=True,
+                                      profile='bulk_load')
+        def settings(conn):
+            return self.pragmas(conn)
+
+        self.assertEqual(settings()['synchronous'], 0)
+
+    def test_custom_pragmas(self):
+        """
+        Test a dict of pragmas can be used as a profile
+        """
+        conn = sqlite3.connect(self.db_path)
+        db_module.apply_profile(conn, {'cache_size': -1024})
+        self.assertEqual(self.pragmas(conn)['cache_size'], -1024)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()